@@ -1,25 +1,31 @@
 import os
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QModelIndex, QEvent, QObject
+from PySide6.QtCore import Qt, QModelIndex, QEvent, QObject, QTimer
 from PySide6.QtGui import QIcon, QAction, QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QListView, QMenu, QWidget, QApplication,
     QStyle, QAbstractItemView, QDialog, QFileDialog, QMessageBox
 )
 
-from controllers.utils import view_utils, path_utils
+from controllers.utils import view_utils
+from controllers.utils.path_utils import natural_key
 from controllers.utils.gallery_history import GalleryHistory
 from controllers.utils.state_utils import GalleryState, ViewerState
-from models.thumbnail_model import ThumbnailListModel
+from models.thumbnail_model import IS_DIR_ROLE, ThumbnailListModel
 
 from ui.ui_gallery_tab import Ui_Form
 from widgets.metadata_dialog import MetadataDialog
 from widgets.rename_dialog import RenameDialog
+from widgets.thumbnail_delegate import ThumbnailDelegate
 
 import logging
 
 _SORT_KEYS = {0: "name", 1: "date", 2: "size"}
+# rows past the viewport whose thumbnails are fetched right after the visible ones, in screenfuls
+PREFETCH_SCREENS = 2
+# quiet time after scrolling before thumbnail work is re-prioritised
+REPRIORITIZE_MS = 60
 
 logger = logging.getLogger(__name__)
 
@@ -35,12 +41,14 @@ class GalleryController:
         self._host_widget = host_widget  # differentiate root vs tabs
 
         self.media_manager.renamed.connect(self._on_renamed)
+        self.media_manager.media_changed.connect(self._on_media_changed)
 
         # ---------- model / view ----------
         self._model = ThumbnailListModel()
         self.ui.galleryList.setViewMode(QListView.IconMode)
         self.ui.galleryList.setResizeMode(QListView.Adjust)
         self.ui.galleryList.setModel(self._model)
+        self.ui.galleryList.setItemDelegate(ThumbnailDelegate(self.ui.galleryList))
 
         # ---------- state objects ----------
         self.state = GalleryState()
@@ -54,9 +62,18 @@ class GalleryController:
             grid=self._gallery_grid,
             preset=self._gallery_preset,
         )
+        self._thumb_level = view_utils.thumb_level(self.ui.galleryList, self._gallery_preset)
 
         # ---------- icons & helpers ----------
-        self._folder_icon = QApplication.style().standardIcon(QStyle.SP_DirIcon)
+        self._model.folder_icon = QApplication.style().standardIcon(QStyle.SP_DirIcon)
+
+        # ---------- thumbnail scheduling ----------
+        self._thumb_owner = f"gallery-{id(self)}"
+        self._reprioritize = QTimer()
+        self._reprioritize.setSingleShot(True)
+        self._reprioritize.setInterval(REPRIORITIZE_MS)
+        self._reprioritize.timeout.connect(self._prioritize_thumbs)
+        self.ui.galleryList.verticalScrollBar().valueChanged.connect(self._reprioritize.start)
         self._mid_filter = _MiddleClickFilter(self.ui.galleryList, self._open_in_new_tab)
         self.ui.galleryList.viewport().installEventFilter(self._mid_filter)
 
@@ -74,7 +91,6 @@ class GalleryController:
 
         # ---------- activation ----------
         self.ui.galleryList.activated.connect(self._on_item_activated)
-        self.media_manager.thumb_ready.connect(self._on_thumb_ready)
 
         # ---------- view / sort controls ----------
         self.ui.btn_gallery_view.toggled.connect(self._toggle_view)
@@ -107,13 +123,14 @@ class GalleryController:
         :return: None
         """
         logger.debug(f"_push_page called with folder abspath: {folder_abspath}")
-        folder = Path(folder_abspath)
-        if not folder.is_dir():
+        # served from the DB when imported, the folder is reconciled with disk in the background
+        entries = self.media_manager.list_folder(folder_abspath)
+        if entries is None:
             return
 
-        raw_paths = path_utils.list_subdirs(folder) + path_utils.list_images(folder)
-        sorted_paths = self._get_sorted_paths(raw_paths)
-        self.populate_gallery(sorted_paths)
+        dirs = {e.path for e in entries if e.is_dir}
+        sorted_paths = self._get_sorted_paths(list(dirs), [e.path for e in entries if not e.is_dir])
+        self.populate_gallery(sorted_paths, dirs)
 
     def open_folder(self, folder_abspath: str):
         """
@@ -130,6 +147,12 @@ class GalleryController:
         if hasattr(self.ui, "btn_forward"):
             self.ui.btn_forward.setEnabled(False)
 
+    def reload_folder(self) -> None:
+        """
+        Re-list the folder on display, e.g. after a rescan changed it.
+        """
+        self._reload_gallery()
+
     def _navigate(self, delta: int) -> None:
         logger.debug(f"navigate {delta}")
         new_folder = self.history.step(delta)
@@ -156,7 +179,7 @@ class GalleryController:
             logger.warning(f"Item at {index.row()} has no path")
             return
         # If the item is recognized as a folder, call the open folder method on the path
-        if Path(path).is_dir():
+        if self._model.data(index, IS_DIR_ROLE):
             self.open_folder(path)
         # Otherwise, its media, and it will be opened accordingly
         else:
@@ -168,22 +191,33 @@ class GalleryController:
         logger.info("toggle_view called")
         self._gallery_grid = checked
         view_utils.apply_gallery_view(self.ui.galleryList, grid=checked, preset=self._gallery_preset)
+        self._fit_thumb_cache()
 
     def _change_size(self, preset):
         logger.info("_change_size called")
         self._gallery_preset = preset
         view_utils.apply_gallery_view(self.ui.galleryList, grid=self._gallery_grid, preset=preset)
-
-    def _get_sorted_paths(self, paths: list[str]) -> list[str]:
+        level = view_utils.thumb_level(self.ui.galleryList, preset)
+        if level != self._thumb_level:
+            # current icons stay up, replaced as the new level arrives
+            self._thumb_level = level
+            self.resume_thumbs()
+        self._fit_thumb_cache()
+
+    def _fit_thumb_cache(self):
+        tiles = view_utils.tiles_per_view(self.ui.galleryList, grid=self._gallery_grid, preset=self._gallery_preset)
+        self.media_manager.fit_thumb_cache(f"gallery-{id(self)}", tiles, self._thumb_level)
+
+    def _get_sorted_paths(self, dirs: list[str], files: list[str]) -> list[str]:
         """
-        Sort a mixed list of file and folder paths using current sort settings. Excludes root folder.
-        :param paths: list of paths to be sorted
+        Folders by name, then files using current sort settings. Excludes root folder.
+        :param dirs: folder paths
+        :param files: file paths
         :return:
         """
         key = _SORT_KEYS.get(self.ui.cmb_gallery_sortKey.currentIndex(), "name")
         asc = not self.ui.btn_gallery_sortDir.isChecked()
-        dirs, files = path_utils.split_dirs_files(paths)
-        dirs = [p for p in dirs if p != self.state.current_folder]
+        dirs = sorted((p for p in dirs if p != self.state.current_folder), key=natural_key)
         ordered_files = self.media_manager.order_subset(files, key, asc)
         return dirs + ordered_files
 
@@ -193,48 +227,85 @@ class GalleryController:
             logger.warning("Model is empty; nothing to sort")
             return
 
-        sorted_paths = self._get_sorted_paths(self._model.get_paths())
-        self.populate_gallery(sorted_paths)
+        paths = self._model.get_paths()
+        dirs = {p for p in paths if self._model.is_dir(p)}
+        sorted_paths = self._get_sorted_paths(list(dirs), [p for p in paths if p not in dirs])
+        self.populate_gallery(sorted_paths, dirs)
 
     # ----------------------------- Gallery population & thumbnails -----------------------------
-    def populate_gallery(self, paths: list[str]) -> None:
+    def populate_gallery(self, paths: list[str], dirs: set[str] = frozenset()) -> None:
         """
         Method that takes in a list of paths, and creates the gallery data structures accordingly
         :param paths:
+        :param dirs: Which of paths are folders, from the listing (no stat per row)
         :return:
         """
         logger.info("populate_gallery called")
         logger.debug(f"populate_gallery called with paths: {paths}")
-        self._set_paths_filtered(paths)
+        self._set_paths_filtered(paths, dirs)
 
-        for p in paths:
-            if Path(p).is_file():
-                self.media_manager.thumb(p)
-            # If is folder
-            else:
-                self._model.update_icon(p, self._folder_icon)
+        files = [p for p in self._model.get_paths() if p not in dirs]
+
+        # replaces any thumbnails still queued for the previous folder
+        self.media_manager.request_thumbs(self._thumb_owner, files, self._thumb_level, self._on_thumbs_ready)
+        self._prioritize_thumbs()
+        self._reprioritize.start()  # again once the view has laid out the new rows
+
+    def _prioritize_thumbs(self) -> None:
+        """
+        Move thumbnails of the rows on screen, then PREFETCH_SCREENS below them, to the front of the queue.
+        """
+        first, last = view_utils.visible_rows(self.ui.galleryList)
+        if last < first:
+            return
+        paths = self._model.get_paths()
+        margin = (last - first + 1) * PREFETCH_SCREENS
+        self.media_manager.prioritize_thumbs(
+            self._thumb_owner,
+            paths[first:last + 1],
+            paths[max(0, first - margin // 2):first] + paths[last + 1:last + 1 + margin],
+        )
 
-    def _set_paths_filtered(self, paths: list[str]) -> None:
+    def _set_paths_filtered(self, paths: list[str], dirs: set[str]) -> None:
         """
         Push paths to the model, hiding variants unless expanded.
         :param paths:
+        :param dirs: Which of paths are folders
         :return:
         """
-        shown: list[str] = []
-        for p in paths:
-            if self.media_manager.is_variant(p):
-                base = self.media_manager.stack_paths(p)[0]
-                if base not in self.state.expanded_bases:
-                    continue  # collapsed -> hide
-            shown.append(p)
+        shown = [p for p in paths if p in dirs or not self._hidden_variant(p)]
 
-        self._model.set_paths(shown)
+        self._model.set_paths(shown, dirs)
+        self._model.set_stacked(self.media_manager.stacked_bases(shown))
         self.state.row_map = {p: i for i, p in enumerate(shown)}
         logger.debug(f"_set_paths_filtered called, new gallery items: {self.state.row_map}")
 
-    def _on_thumb_ready(self, path: str, pix) -> None:
-        icon = QIcon(pix)
-        self._model.update_icon(path, icon)
+    def _hidden_variant(self, path: str) -> bool:
+        """
+        True if path is a variant whose stack is collapsed.
+        """
+        if not self.media_manager.is_variant(path):
+            return False
+        base = self.media_manager.stack_paths(path)[0]
+        return base not in self.state.expanded_bases
+
+    def _on_thumbs_ready(self, pixmaps: dict) -> None:
+        # only paths this gallery subscribed to, at its current level
+        self._model.set_icons({p: QIcon(pix) for p, pix in pixmaps.items()})
+
+    def suspend_thumbs(self) -> None:
+        """
+        Stop receiving / queueing thumbnails, e.g. while the tab sits in the closed-tabs stack.
+        """
+        self.media_manager.cancel_thumbs(self._thumb_owner)
+
+    def resume_thumbs(self) -> None:
+        """
+        Re-subscribe to every file row at the current level, rows already showing it are served from cache.
+        """
+        files = [p for p in self._model.get_paths() if not self._model.is_dir(p)]
+        self.media_manager.request_thumbs(self._thumb_owner, files, self._thumb_level, self._on_thumbs_ready)
+        self._prioritize_thumbs()
 
     # ---------------------------- Variant-stack handling ----------------------------
 
@@ -295,6 +366,9 @@ class GalleryController:
         rename_act = menu.addAction("Rename")
         edit_act = menu.addAction("Edit metadata")
         act_move = menu.addAction("Move to...")
+        is_file = not self._model.data(idx, IS_DIR_ROLE)
+        act_similar = menu.addAction("Find similar") if is_file else None
+        act_stack_similar = menu.addAction("Stack similar as variants") if is_file else None
 
         # Ensure gallery is always properly rendered
         menu.aboutToHide.connect(self._reload_gallery)
@@ -313,6 +387,27 @@ class GalleryController:
             MetadataDialog(sel, self.media_manager, self.tag_manager, self._host_widget).exec()
         elif chosen == act_move:
             self._on_move_triggered(sel)
+        elif chosen is not None and chosen == act_similar:
+            self.media_manager.find_similar(abs_path)
+        elif chosen is not None and chosen == act_stack_similar:
+            self._stack_similar(base_path)
+
+    def _stack_similar(self, base_path: str) -> None:
+        candidates = self.media_manager.similar_variant_candidates(base_path)
+        if not candidates:
+            QMessageBox.information(self._host_widget, "Stack similar", "No similar unstacked files in this folder.")
+            return
+        names = "\n".join(Path(p).name for p in candidates[:20])
+        more = f"\n… and {len(candidates) - 20} more" if len(candidates) > 20 else ""
+        answer = QMessageBox.question(
+            self._host_widget, "Stack similar",
+            f"Stack these under {Path(base_path).name}?\n\n{names}{more}",
+        )
+        if answer != QMessageBox.Yes:
+            return
+        added = self.media_manager.stack_as_variants(base_path, candidates)
+        logger.info(f"Stacked {added} similar files under {base_path}")
+        self._reload_gallery()
 
     def _on_rename_triggered(self, idx):
         logger.info("Renaming media")
@@ -333,32 +428,72 @@ class GalleryController:
         :param new_path: new gallery path
         :return:
         """
-        root_dir = Path(self.state.current_folder)
-        new_parent = Path(new_path).parent
-        old_in_view = old_path in self.state.row_map
-
-        # Rename stays within this folder
-        if old_in_view and new_parent == root_dir:
-            row = self.state.row_map.pop(old_path)
-            self.state.row_map[new_path] = row
-            self._model.update_display(old_path, Path(new_path).name, new_user_role=new_path)
-            self.media_manager.thumb(new_path)
-            self._apply_sort()
-            return
+        self._apply_changes(moved=[(old_path, new_path)])
 
-        # File moved out of this folder, therefore drop the row
-        if old_in_view and new_parent != root_dir:
-            row = self.state.row_map.pop(old_path)
-            self._model.removeRow(row)
-            self._apply_sort()
-            return
+    def _on_media_changed(self, result) -> None:
+        """
+        Apply a watcher SyncResult to the visible rows only, no full reload.
+        :param result: SyncResult from the folder watcher
+        :return:
+        """
+        self._apply_changes(
+            removed=result.removed + result.removed_dirs,
+            added=result.added + result.new_dirs,
+            new_dirs=set(result.new_dirs),
+            moved=result.moved,
+        )
 
-        # File moved into this folder (wasn't visible before)
-        if not old_in_view and new_parent == root_dir:
-            row = self._model.add_path(new_path)
-            self.state.row_map[new_path] = row
-            self.media_manager.thumb(new_path)
-            self._apply_sort()
+    def _apply_changes(self, *, removed=(), added=(), new_dirs=frozenset(), moved=()) -> None:
+        """
+        Patch the rows of the current folder in place: one remove, renames, one insert, then at most one re-sort.
+        :param removed: Paths gone from disk
+        :param added: New paths, anywhere in the library
+        :param new_dirs: Which of added are folders
+        :param moved: (old, new) pairs, a move within the folder is a rename of its row
+        :return:
+        """
+        if not self.state.current_folder:
+            return
+        root_dir = Path(self.state.current_folder)
+        in_view = self.state.row_map
+
+        renamed, arrived = [], []
+        gone = [p for p in removed if p in in_view]
+        for old, new in moved:
+            here = Path(new).parent == root_dir
+            if old in in_view:
+                if here:
+                    renamed.append((old, new))
+                else:
+                    gone.append(old)  # moved out of this folder
+            elif here:
+                arrived.append(new)
+
+        self._model.remove_paths(gone)
+        for old, new in renamed:
+            self._model.update_display(old, Path(new).name, new_user_role=new)
+
+        fresh = [p for p in dict.fromkeys([*added, *arrived])
+                 if Path(p).parent == root_dir and self._model.row_of(p) is None
+                 and (p in new_dirs or not self._hidden_variant(p))]
+        files = [p for p in fresh if p not in new_dirs]
+        self._model.insert_paths(fresh, dirs=new_dirs, stacked=self.media_manager.stacked_bases(files))
+        for p in files + [new for _, new in renamed]:
+            self.media_manager.thumb(p, self._thumb_owner)
+
+        if fresh or renamed:
+            self._resort()
+        if gone or fresh or renamed:
+            self.state.row_map = {p: i for i, p in enumerate(self._model.get_paths())}
+
+    def _resort(self) -> None:
+        """
+        Re-order the current rows by the sort settings, keeping icons and selection (no model reset).
+        """
+        paths = self._model.get_paths()
+        dirs = [p for p in paths if self._model.is_dir(p)]
+        files = [p for p in paths if not self._model.is_dir(p)]
+        self._model.reorder(self._get_sorted_paths(dirs, files))
 
     def _on_move_triggered(self, sel):
         if not sel:
@@ -401,7 +536,7 @@ class GalleryController:
         # Navigation list = every visible file that is not a variant
         nav_paths = [
             p for p in self._model.get_paths()
-            if Path(p).is_file() and not self.media_manager.is_variant(p)
+            if not self._model.is_dir(p) and not self.media_manager.is_variant(p)
         ]
         cur_idx = nav_paths.index(base)  # viewer index
 
@@ -436,7 +571,7 @@ class GalleryController:
             return
 
         abs_path = self._model.data(index, Qt.UserRole)
-        target = abs_path if Path(abs_path).is_dir() else str(Path(abs_path).parent)
+        target = abs_path if self._model.data(index, IS_DIR_ROLE) else str(Path(abs_path).parent)
 
         # TODO Allow switch parameter to be changed
         self.tab_controller.open_folder_tab(
@@ -455,7 +590,7 @@ class GalleryController:
             return
 
         abs_path = self._model.data(index, Qt.UserRole)
-        target = abs_path if Path(abs_path).is_dir() else str(Path(abs_path).parent)
+        target = abs_path if self._model.data(index, IS_DIR_ROLE) else str(Path(abs_path).parent)
 
         # Delegate to TabController helper (spawns subprocess)
         self.tab_controller.open_in_new_window(target)
@@ -1,9 +1,9 @@
 from pathlib import Path
 import logging
 
-from PySide6.QtWidgets import QFileDialog
+from PySide6.QtWidgets import QCheckBox, QFileDialog, QPushButton
 
-from services.import_service import ImportSummary
+from services.import_service import ImportSummary, ImportProgress
 from widgets.folder_tree_widget import FolderTreeWidget
 
 logger = logging.getLogger(__name__)
@@ -17,6 +17,10 @@ class ImportController:
 
         # Used for tracking chosen import folder for debug
         self._import_root = None
+        # roots of the running rescan still to report, with the totals of those that did
+        self._rescan_left: set[str] = set()
+        self._rescan_added = self._rescan_skipped = 0
+        self._rescan_errors: list[str] = []
 
         self.ui = ui
         self.media_manager = media_manager
@@ -26,6 +30,7 @@ class ImportController:
         # Connect Import page
         self.ui.chooseBtn.clicked.connect(self._choose_folder)
         media_manager.import_finished.connect(self.handle_scan_finished)
+        media_manager.import_progress.connect(self.handle_scan_progress)
 
         tree = FolderTreeWidget(ui.import_page)
         parent_layout = ui.debugFolderTree.parentWidget().layout()  # ← fixed line
@@ -33,7 +38,18 @@ class ImportController:
         ui.debugFolderTree.deleteLater()
         ui.debugFolderTree = tree
 
-        media_manager.import_finished.connect(self.handle_scan_finished)
+        # Re-scan known roots, unchanged directories are skipped via the scan_dirs cache
+        self.rescan_btn = QPushButton("RESCAN ROOTS", ui.import_page)
+        self.rescan_btn.setIcon(ui.chooseBtn.icon())
+        self.rescan_btn.setSizePolicy(ui.chooseBtn.sizePolicy())
+        parent_layout.addWidget(self.rescan_btn, 4, 1, 1, 1)
+        self.rescan_btn.clicked.connect(self._rescan_roots)
+
+        # Background thumbnail generation for imported files, remembered across sessions
+        self.warm_chk = QCheckBox("Generate thumbnails in the background", ui.import_page)
+        self.warm_chk.setChecked(media_manager.warmup.enabled)
+        parent_layout.addWidget(self.warm_chk, 5, 1, 1, 1)
+        self.warm_chk.toggled.connect(media_manager.warmup.set_enabled)
 
         logger.info("Import setup complete")
 
@@ -45,14 +61,58 @@ class ImportController:
             self.ui.importStatus.setText("Scanning...")
             self.media_manager.scan_folder(folder)
 
+    def _rescan_roots(self) -> None:
+        if self._rescan_left:
+            return  # still running
+        roots = self.media_manager.rescan_roots()
+        self._rescan_left = {str(Path(r)) for r in roots}
+        self._rescan_added = self._rescan_skipped = 0
+        self._rescan_errors = []
+        self.ui.importStatus.setText("Rescanning..." if roots else "Nothing imported yet")
+
+    def handle_scan_progress(self, progress: ImportProgress):
+        eta = f" · ETA {progress.eta:.0f}s" if progress.eta is not None else ""
+        self.ui.importStatus.setText(
+            f"Scanning... {progress.seen:,} files · Added {progress.added:,} · "
+            f"Skipped {progress.skipped:,} · {progress.rate:,.0f} files/s{eta}"
+        )
+
     def handle_scan_finished(self, summary: ImportSummary):
+        root_path = str(summary.root)
+        if root_path in self._rescan_left:
+            self._handle_rescan_finished(summary)
+            return
+        if summary.error:
+            self.ui.importStatus.setText(
+                f"Import failed after adding {summary.added} · Skipped {summary.skipped}: {summary.error}"
+            )
+            return
         self.ui.importStatus.setText(
             f"Added {summary.added} · Skipped {summary.skipped} "
             f"in {summary.duration:.1f}s"
         )
 
         if self._import_root:
-            root_path = str(summary.root)
-            tree_data = self.media_manager.walk_tree(root_path)
-            self.ui.debugFolderTree.load_tree(tree_data, root_path)
+            # tree is a by-product of the import, no second walk of the disk
+            self.ui.debugFolderTree.load_tree(summary.tree or {}, root_path)
             self.gallery_controller.open_folder(root_path)
+
+    def _handle_rescan_finished(self, summary: ImportSummary):
+        """
+        Roots are rescanned one after another: totals add up and the gallery refreshes once, after the last.
+        """
+        self._rescan_left.discard(str(summary.root))
+        self._rescan_added += summary.added
+        self._rescan_skipped += summary.skipped
+        if summary.error:
+            self._rescan_errors.append(f"{summary.root}: {summary.error}")
+        if self._rescan_left:
+            self.ui.importStatus.setText(
+                f"Rescanning... {len(self._rescan_left)} roots left · Added {self._rescan_added} · "
+                f"Skipped {self._rescan_skipped}"
+            )
+            return
+
+        failed = f" · Failed {'; '.join(self._rescan_errors)}" if self._rescan_errors else ""
+        self.ui.importStatus.setText(f"Rescan added {self._rescan_added} · Skipped {self._rescan_skipped}{failed}")
+        self.gallery_controller.reload_folder()
@@ -1,13 +1,16 @@
+from array import array
 from pathlib import Path
 import logging
 
-from PySide6.QtCore import QSize, QModelIndex, Qt, QEvent, QObject
+from PySide6.QtCore import QSize, QModelIndex, Qt, QEvent, QObject, QTimer
 from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtWidgets import QApplication, QStyle
 
 import controllers.utils.view_utils as view_utils
 from controllers.utils.state_utils import ViewerState
-from models.thumbnail_model import ThumbnailListModel
+from models.media_id_model import MediaIdListModel
+from models.thumbnail_model import IS_DIR_ROLE
+from widgets.thumbnail_delegate import ThumbnailDelegate
 
 GALLERY_PAGE_INDEX = 0
 WIDGET_PAGE_INDEX = 1
@@ -24,6 +27,14 @@ _SORT_KEYS = {
 # TODO allow folders showing in search to be toggled
 SHOW_FOLDERS = True
 
+# special query listing byte-identical files, grouped
+DUPLICATES_QUERY = "is:duplicate"
+
+_THUMB_OWNER = "search"
+# rows past the viewport whose thumbnails are fetched right after the visible ones, in screenfuls
+PREFETCH_SCREENS = 2
+REPRIORITIZE_MS = 60
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,28 +49,36 @@ class SearchController(QObject):
         self.tab_controller = tab_controller
         self.gallery_controller = gallery_controller
 
-        self._search_items: dict[str, int] = {}
         self._result_paths: list[str] = []
+        self._grouped = False  # duplicate groups / similarity ranks keep their order, sorting is skipped
+        self._show_all = False  # blank query: ids come straight from the DB, no path list is built
+        self._duplicates = False  # duplicate groups shown, refreshed whenever a hashing pass ends
 
         self.viewer = ViewerState()
         self._host_widget = host_widget
 
-        self._model = ThumbnailListModel()
+        self._model = MediaIdListModel(self.media_manager.media_rows)
+        self._model.folder_icon = QApplication.style().standardIcon(QStyle.SP_DirIcon)
         self.ui.resultsList.setModel(self._model)
-
-        self._folder_icon = QApplication.style().standardIcon(QStyle.SP_DirIcon)
+        self.ui.resultsList.setItemDelegate(ThumbnailDelegate(self.ui.resultsList))
 
         # Apply search defaults
         self._search_grid = True
         self._search_preset = "Medium"
         view_utils.apply_gallery_view(self.ui.resultsList, grid=self._search_grid, preset=self._search_preset)
+        self._thumb_level = view_utils.thumb_level(self.ui.resultsList, self._search_preset)
 
         # Connect Search bar
         self.ui.searchBtn.clicked.connect(self._exec_search)
         self.ui.searchEdit.returnPressed.connect(self._exec_search)
 
-        # Connect thumbnail method to media signals
-        self.media_manager.thumb_ready.connect(self._on_thumb_ready)
+        # Similarity results open in the search page
+        self.media_manager.similar_found.connect(self._show_similar)
+
+        # Duplicate groups follow the background content-hash passes
+        self.ui.searchDesc.setText("")
+        self.media_manager.hashing_progress.connect(self._on_hashing_progress)
+        self.media_manager.hashing_finished.connect(self._on_hashing_finished)
 
         # toggle button
         self.ui.btn_search_view.toggled.connect(self._toggle_view)
@@ -73,6 +92,13 @@ class SearchController(QObject):
         self.ui.resultsList.activated.connect(self._on_item_activated)
         self.ui.resultsList.viewport().installEventFilter(self)
 
+        # Thumbnail priority follows the scroll position
+        self._reprioritize = QTimer(self)
+        self._reprioritize.setSingleShot(True)
+        self._reprioritize.setInterval(REPRIORITIZE_MS)
+        self._reprioritize.timeout.connect(self._prioritize_thumbs)
+        self.ui.resultsList.verticalScrollBar().valueChanged.connect(self._reprioritize.start)
+
         # Sort hooks
         self.ui.cmb_search_sortKey.currentIndexChanged.connect(self._apply_sort)
         self.ui.btn_search_sortDir.toggled.connect(self._apply_sort)
@@ -84,10 +110,18 @@ class SearchController(QObject):
         term = self.ui.searchEdit.text().strip()
         logger.debug(f"Search query: {term}")
 
-        if not term:
-            # if blank query, return all media
-            self._result_paths = self.media_manager.all_paths(files_only=False)
+        if term.lower() == DUPLICATES_QUERY:
+            self._show_duplicates()
+            return
+        self._duplicates = False
+        self.ui.searchDesc.setText("")
+        self._grouped = False
+        self._show_all = not term  # blank query lists the whole library
+        if self._show_all:
+            self._result_paths = []
             self._apply_sort()
+            self.ui.stackedWidget.setCurrentIndex(SEARCH_PAGE_INDEX)
+            return
 
         paths = (
             self.search_manager.tag_search(term)
@@ -100,37 +134,101 @@ class SearchController(QObject):
 
         self.ui.stackedWidget.setCurrentIndex(SEARCH_PAGE_INDEX)
 
-    def _apply_sort(self):
-        logger.info("Sort started")
-        if not self._result_paths:
+    def _show_duplicates(self) -> None:
+        """
+        Show the groups hashed so far and bring the hashes up to date, the list refreshes when the pass ends.
+        """
+        self._duplicates = True
+        self.media_manager.hash_library()
+        self._load_duplicates()
+        if self.media_manager.is_hashing():
+            self.ui.searchDesc.setText("Hashing new files...")
+        self.ui.stackedWidget.setCurrentIndex(SEARCH_PAGE_INDEX)
+
+    def _load_duplicates(self) -> None:
+        groups = self.media_manager.duplicate_groups()
+        logger.info(f"Duplicate search: {len(groups)} groups")
+        self._grouped = True
+        self._show_all = False
+        self._result_paths = [p for group in groups for p in group]
+        self._apply_sort()
+        self.ui.searchDesc.setText(f"{len(groups):,} duplicate groups")
+
+    def _on_hashing_progress(self, done: int, total: int) -> None:
+        if self._duplicates:
+            self.ui.searchDesc.setText(f"Hashing new files... {done:,} / {total:,}")
+
+    def _on_hashing_finished(self, summary) -> None:
+        if not self._duplicates:
             return
+        self._load_duplicates()
+        if summary.error:
+            self.ui.searchDesc.setText(f"Hashing failed, duplicates may be incomplete: {summary.error}")
+
+    def _show_similar(self, path: str, similar: list[str]) -> None:
+        logger.info(f"Similar search: {len(similar)} matches for {path}")
+        self._duplicates = False
+        self.ui.searchDesc.setText("")
+        self.ui.searchEdit.setText(f"similar:{Path(path).name}")
+        self._grouped = True  # keep closest-first order
+        self._show_all = False
+        self._result_paths = [path, *similar]
+        self._apply_sort()
+        self.ui.stackedWidget.setCurrentIndex(SEARCH_PAGE_INDEX)
 
+    def _apply_sort(self):
+        logger.info("Sort started")
         key = _SORT_KEYS.get(self.ui.cmb_search_sortKey.currentIndex(), "name")
         asc = not self.ui.btn_search_sortDir.isChecked()
-        ordered = self.media_manager.order_subset(self._result_paths, key, asc)
-
-        # repopulate model
-        self._model.set_paths(ordered)
-        self._search_items = {p: i for i, p in enumerate(ordered)}
-
-        for p in ordered:
-            if Path(p).is_dir():
-                self._model.update_icon(p, self._folder_icon)
-            else:
-                self.media_manager.thumb(p)
+        if self._show_all:
+            ids = self.media_manager.sorted_ids(key, asc, files_only=not SHOW_FOLDERS)
+        elif self._result_paths:
+            ordered = (self._result_paths if self._grouped
+                       else self.media_manager.order_subset(self._result_paths, key, asc))
+            ids = self.media_manager.ids_in_order(ordered)
+        else:
+            ids = array("q")
 
-    def _on_thumb_ready(self, path: str, pix: QPixmap) -> None:
-        logger.debug(f"Thumbnail read at path: {path}")
-        icon = QIcon(pix)
+        # repopulate model, rows resolve lazily as they are painted
+        self._model.set_ids(ids)
+        if not ids:
+            self.media_manager.cancel_thumbs(_THUMB_OWNER)
+            return
+        self._request_thumbs()
+        self._reprioritize.start()
+
+    def _request_thumbs(self) -> None:
+        """
+        (Re)start the view's thumbnail subscription at the current level, then fill it with the window.
+        """
+        self.media_manager.request_thumbs(_THUMB_OWNER, [], self._thumb_level, self._on_thumbs_ready)
+        self._prioritize_thumbs()
+
+    def _prioritize_thumbs(self) -> None:
+        """
+        Add the visible rows plus the prefetch margin to the subscription and queue them first: a result
+        set can span the whole library, the rest is requested once it is scrolled to. Only rows still
+        lacking a thumbnail are added, so a scroll over loaded rows only reorders the queue.
+        """
+        first, last = view_utils.visible_rows(self.ui.resultsList)
+        if last < first:
+            return
+        margin = (last - first + 1) * PREFETCH_SCREENS
+        lo, hi = max(0, first - margin // 2), last + margin
+        window = self._model.paths_in(lo, hi, files_only=True)
+        visible = self._model.paths_in(first, last, files_only=True)
+        shown = set(visible)
+        self.media_manager.add_thumbs(_THUMB_OWNER, self._model.paths_in(lo, hi, files_only=True, no_icon=True))
+        self.media_manager.prioritize_thumbs(_THUMB_OWNER, visible, [p for p in window if p not in shown])
 
-        # Search update
-        if path in self._search_items:
-            self._model.update_icon(path, icon)
+    def _on_thumbs_ready(self, pixmaps: dict[str, QPixmap]) -> None:
+        self._model.set_icons({p: QIcon(pix) for p, pix in pixmaps.items()})
 
     def _toggle_view(self, checked):
         logger.info("_toggle_view called")
         self._search_grid = checked
         view_utils.apply_gallery_view(self.ui.resultsList, grid=checked, preset=self._search_preset)
+        self._fit_thumb_cache()
         # Set scrolling speeds
         self.ui.resultsList.verticalScrollBar().setSingleStep(300)
 
@@ -138,14 +236,22 @@ class SearchController(QObject):
         logger.info("_change_size called")
         self._search_preset = preset
         view_utils.apply_gallery_view(self.ui.resultsList, grid=self._search_grid, preset=preset)
+        level = view_utils.thumb_level(self.ui.resultsList, preset)
+        if level != self._thumb_level:
+            self._thumb_level = level
+            self._request_thumbs()
+        self._fit_thumb_cache()
+
+    def _fit_thumb_cache(self):
+        tiles = view_utils.tiles_per_view(self.ui.resultsList, grid=self._search_grid, preset=self._search_preset)
+        self.media_manager.fit_thumb_cache("search", tiles, self._thumb_level)
 
     def _open_viewer(self, index: QModelIndex):
         path = self._model.data(index, Qt.UserRole)
         stack = self.media_manager.stack_paths(path)
 
-        # navigation list -> skip any file that is a variant
-        paths = [p for p in self._model.get_paths()
-                 if Path(p).is_file() and not self.media_manager.is_variant(p)]
+        # navigation list -> skip folders and variants, paths resolve as the viewer steps through them
+        paths = self._model.nav_paths(self.media_manager.navigation_ids, self.media_manager.get_media_id)
         cur_idx = paths.index(stack[0])  # base index
 
         # open viewer at base, but pass full stack so Up/Down still work
@@ -153,8 +259,8 @@ class SearchController(QObject):
             self.viewer.open_via_callback(paths, cur_idx, stack,
                                           self._host_widget, self.media_manager)
         else:
-            self.viewer.open(self._model, index, self.media_manager,
-                             self.tag_manager, self._host_widget)
+            self.viewer.open_paths(paths, cur_idx, stack, path, self.media_manager,
+                                   self.tag_manager, self._host_widget)
 
     def set_viewer_callback(self, fn):
         self.viewer.callback = fn
@@ -163,8 +269,10 @@ class SearchController(QObject):
         if not index.isValid():
             return
         abs_path = self._model.data(index, Qt.UserRole)
+        if abs_path is None:
+            return
 
-        if Path(abs_path).is_dir():
+        if self._model.data(index, IS_DIR_ROLE):
             # tell the existing GalleryController to switch folders
             self.gallery_controller.open_folder(abs_path)
             # bring Gallery page to front
@@ -183,7 +291,9 @@ class SearchController(QObject):
                 return True  # swallow event
 
             abs_path = self._model.data(idx, Qt.UserRole)
-            target_folder = abs_path if Path(abs_path).is_dir() else str(Path(abs_path).parent)
+            if abs_path is None:
+                return True
+            target_folder = abs_path if self._model.data(idx, IS_DIR_ROLE) else str(Path(abs_path).parent)
 
             self.tab_controller.open_folder_tab(
                 root_path=target_folder,
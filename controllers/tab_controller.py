@@ -32,6 +32,7 @@ class TabController(QObject):
         self.media_manager = media_manager
         self.tag_manager = tag_manager
         self._viewers: dict[QWidget, MediaViewerDialog] = {}
+        self._galleries: dict[QWidget, object] = {}  # host page -> GalleryController
 
         self._tabs = tab_widget
         self._closed: deque = deque(maxlen=MAX_CLOSED_STACK)
@@ -126,6 +127,9 @@ class TabController(QObject):
         if not self._closed:
             return
         widget, title, cur_idx = self._closed.pop()
+        gallery = self._galleries.get(widget)
+        if gallery is not None:
+            gallery.resume_thumbs()
         new_idx = self._tabs.insertTab(cur_idx, widget, title)
         self._tabs.setCurrentIndex(new_idx)
 
@@ -149,7 +153,14 @@ class TabController(QObject):
         title = self._tabs.tabText(idx)
         self._tabs.removeTab(idx)
 
+        # closed tabs no longer receive thumbnails, restore_last re-subscribes them
+        gallery = self._galleries.get(widget)
+        if gallery is not None:
+            gallery.suspend_thumbs()
+
         # Keep widget alive so state isn't lost
+        if len(self._closed) == self._closed.maxlen:
+            self._galleries.pop(self._closed[0][0], None)  # about to fall off the stack
         self._closed.append((widget, title, idx))
 
     def _cycle(self, step: int) -> None:
@@ -174,6 +185,8 @@ class TabController(QObject):
         """
         Called by each GalleryController exactly once. Creates (or reuses) a persistent viewer bound to host_page.
         """
+        self._galleries[host_page] = controller
+
         def _open_viewer(paths, cur_idx, stack):
             viewer = self._viewers.get(host_page)
             if viewer is None:
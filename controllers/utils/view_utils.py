@@ -1,9 +1,10 @@
 from pathlib import Path
-from PySide6.QtCore import QSize, Qt
+from PySide6.QtCore import QSize, Qt, QPoint
 from PySide6.QtWidgets import QListWidget, QListView
 import logging
 
 from widgets.image_viewer import ImageViewerDialog
+from workers.thumb_worker import thumb_level as _level_for
 
 logger = logging.getLogger(__name__)
 
@@ -54,3 +55,60 @@ def apply_gallery_view(view: QListView | QListWidget, *, grid: bool, preset: str
 
     # consistent scroll speed
     view.verticalScrollBar().setSingleStep(300)
+
+
+def tiles_per_view(view: QListView | QListWidget, *, grid: bool, preset: str) -> int:
+    """
+    Roughly how many thumbnails one screenful of view shows with the given preset.
+    :param view:
+    :param grid:
+    :param preset:
+    :return:
+    """
+    icon, cell = icon_preset(preset)
+    vp = view.viewport().size()
+    if not grid:
+        return vp.height() // max(1, icon) + 1
+    cols = max(1, vp.width() // max(1, cell.width()))
+    rows = vp.height() // max(1, cell.height()) + 1
+    return cols * rows
+
+
+def thumb_level(view: QListView | QListWidget, preset: str) -> int:
+    """
+    Thumbnail level to request for the preset's icon size on the view's screen (devicePixelRatio),
+    so icons are drawn from a pixmap close to their device-pixel size.
+    :param view:
+    :param preset:
+    :return:
+    """
+    icon, _ = icon_preset(preset)
+    return _level_for(icon * view.devicePixelRatioF())
+
+
+def visible_rows(view: QListView | QListWidget) -> tuple[int, int]:
+    """
+    First and last model row intersecting the viewport, (0, -1) when the view is empty.
+    Probes a coarse grid near the edges because indexAt misses the spacing between icons.
+    :param view:
+    :return:
+    """
+    model = view.model()
+    n = model.rowCount() if model is not None else 0
+    if not n:
+        return 0, -1
+    rect = view.viewport().rect()
+    xs = range(rect.left(), rect.right() + 1, 16)
+    ys = range(rect.top(), rect.bottom() + 1, 8)
+
+    if view.visualRect(model.index(0, 0)).intersects(rect):
+        first = 0
+    else:
+        first = next((idx.row() for y in ys for x in xs
+                      if (idx := view.indexAt(QPoint(x, y))).isValid()), 0)
+    if view.visualRect(model.index(n - 1, 0)).intersects(rect):
+        last = n - 1
+    else:
+        last = next((idx.row() for y in reversed(ys) for x in reversed(xs)
+                     if (idx := view.indexAt(QPoint(x, y))).isValid()), n - 1)
+    return first, max(first, last)
@@ -71,6 +71,8 @@ class MainWindow(QMainWindow):
         self.ui.minimizeAppBtn.clicked.connect(self.showMinimized)
 
         roots = self.media.root_folders()
+        self.media.watch_roots()
+        self.media.hash_library()  # duplicates of files added while the app was closed
         if roots:
             self.gallery_controller.open_folder(roots[-1])  # newest root
         else:
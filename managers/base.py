@@ -1,4 +1,5 @@
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Iterator
 import sqlite3
 
 
@@ -10,6 +11,27 @@ class BaseManager:
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
         self.cur = conn.cursor()
+        self._tx_depth = 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        `with conn:` that nests: only the outermost block commits (or rolls back), so helpers called
+        inside a caller's transaction do not commit it piecewise.
+        """
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield
+            finally:
+                self._tx_depth -= 1
+            return
+        self._tx_depth = 1
+        try:
+            with self.conn:
+                yield
+        finally:
+            self._tx_depth = 0
 
     # wrappers
     def execute(self, sql: str, params: tuple = ()) -> None:
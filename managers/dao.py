@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import logging
 import os
+from array import array
 import re
 import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any
 
 from controllers.utils.path_utils import natural_key
 from .base import BaseManager
@@ -27,6 +28,36 @@ _SORT_SQL = {
 
 _VARIANT_RE = re.compile(r"^(.*)_v(\d+)$", re.I)  # captures (stem, index)
 
+# max bound parameters per IN (...) query, SQLite builds before 3.32 cap variables at 999
+_SQL_CHUNK = 900
+
+
+def _prefix_range(folder: str) -> tuple[str, str]:
+    """
+    Bounds (lo, hi) such that lo <= path < hi selects everything below folder using the path index.
+    """
+    folder = folder.rstrip("/\\") + os.sep
+    return folder, folder[:-1] + chr(ord(os.sep) + 1)
+
+
+def _split_variant(path: str) -> tuple[str, str, str, re.Match | None]:
+    """
+    (folder, stem, suffix, _VARIANT_RE match on the stem) for variant grouping.
+    """
+    folder, name = os.path.split(path)
+    stem, suffix = os.path.splitext(name)
+    return folder, stem, suffix, _VARIANT_RE.match(stem)
+
+
+def _media_type(suffix: str, is_dir) -> str:
+    suffix = suffix.lower()
+    return (
+        "gif" if suffix == ".gif" else
+        "video" if suffix in (".mp4", ".mkv", ".webm", ".mov") else
+        "image" if not is_dir else
+        "dir"
+    )
+
 
 class MediaDAO(BaseManager):
     """
@@ -40,21 +71,20 @@ class MediaDAO(BaseManager):
 
     # ---------- Core Operations ----------
 
-    def insert_media(self, path: str, st: os.stat_result | None = None) -> int:
+    def insert_media(self, path: str, st: os.stat_result | None = None, *, is_dir: bool | None = None) -> int:
+        """
+        Insert one media row. st may be an os.stat_result or any stat-compatible object (e.g. a ScanEntry);
+        passing is_dir skips the extra filesystem check.
+        """
         p = Path(path)
         st = st or p.stat()
-        is_dir = int(p.is_dir())
+        is_dir = int(p.is_dir() if is_dir is None else is_dir)
         size = 0 if is_dir else st.st_size
         inode = st.st_ino
         mtime = int(st.st_mtime)
-        ftype = (
-            "gif" if p.suffix.lower() == ".gif" else
-            "video" if p.suffix.lower() in (".mp4", ".mkv", ".webm", ".mov") else
-            "image" if not is_dir else
-            "dir"
-        )
+        ftype = _media_type(p.suffix, is_dir)
 
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 """
                 INSERT INTO media(path, added, is_dir, byte_size,
@@ -72,8 +102,47 @@ class MediaDAO(BaseManager):
         ).fetchone()
         return row["id"] if row else 0
 
+    def insert_media_many(self, rows: Iterable[tuple[str, int, int, int, bool]]) -> dict[str, int]:
+        """
+        Bulk insert_media for imports. rows are (path, inode, size, mtime, is_dir) tuples such as ScanEntry.
+        Existing paths are left untouched.
+        :return: {path: id} for every row, whether newly inserted or already present
+        """
+        now = int(time.time())
+        params = [
+            (path, now, int(is_dir), 0 if is_dir else size,
+             _media_type(os.path.splitext(path)[1], is_dir), inode, int(mtime))
+            for path, inode, size, mtime, is_dir in rows
+        ]
+        if not params:
+            return {}
+
+        with self.transaction():
+            self.cur.executemany(
+                """
+                INSERT INTO media(path, added, is_dir, byte_size,
+                                  type, inode, mtime)
+                VALUES (?,?,?,?,?,?,?)
+                ON CONFLICT(path) DO NOTHING
+                """,
+                params,
+            )
+        return self.ids_for_paths([p[0] for p in params])
+
+    def ids_for_paths(self, paths: list[str]) -> dict[str, int]:
+        """
+        Return {path: id} for the given paths, chunked to stay under SQLite's variable limit.
+        """
+        out: dict[str, int] = {}
+        for i in range(0, len(paths), _SQL_CHUNK):
+            chunk = paths[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            rows = self.cur.execute(f"SELECT id, path FROM media WHERE path IN ({q})", chunk).fetchall()
+            out.update((r["path"], r["id"]) for r in rows)
+        return out
+
     def update_media_path(self, mid: int, new_path: str, mtime: int) -> None:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "UPDATE media SET path = ?, mtime = ? WHERE id = ?",
                 (new_path, mtime, mid),
@@ -83,20 +152,22 @@ class MediaDAO(BaseManager):
         """
         Return {inode: (id, path)} for any rows whose inode is in inodes.
         """
-        if not inodes:
-            return {}
-        q = ",".join("?" * len(inodes))
-        rows = self.cur.execute(
-            f"SELECT id, path, inode FROM media WHERE inode IN ({q})", inodes
-        ).fetchall()
-        return {r["inode"]: (r["id"], r["path"]) for r in rows}
+        out: dict[int, tuple[int, str]] = {}
+        for i in range(0, len(inodes), _SQL_CHUNK):
+            chunk = inodes[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            rows = self.cur.execute(
+                f"SELECT id, path, inode FROM media WHERE inode IN ({q})", chunk
+            ).fetchall()
+            out.update((r["inode"], (r["id"], r["path"])) for r in rows)
+        return out
 
     def set_attr(self, media_id: int, **kwargs):
         logger.debug(f"Setting attributes for {media_id} with args {kwargs}")
         if not kwargs:
             return
         cols = ", ".join(f"{k}=?" for k in kwargs)
-        with self.conn:
+        with self.transaction():
             self.cur.execute(f"UPDATE media SET {cols} WHERE id=?", (*kwargs.values(), media_id))
 
     def get_attr(self, media_id: int) -> Dict[str, Any]:
@@ -109,12 +180,16 @@ class MediaDAO(BaseManager):
     # ------------------------------ Variants ------------------------------
     def add_variant(self, base_id: int, variant_id: int, rank: int):
         logger.debug(f"Adding variant {variant_id} to {base_id}, with rank {rank}")
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "INSERT OR IGNORE INTO variants(base_id, variant_id, rank) VALUES (?,?,?)",
                 (base_id, variant_id, rank)
             )
 
+    def max_variant_rank(self, base_id: int) -> int:
+        row = self.fetchone("SELECT COALESCE(MAX(rank), 0) AS r FROM variants WHERE base_id=?", (base_id,))
+        return row["r"]
+
     def is_variant(self, path: str) -> bool:
         row = self.fetchone("SELECT id FROM media WHERE path=?", (path,))
         if not row:
@@ -136,6 +211,21 @@ class MediaDAO(BaseManager):
         row = self.fetchone("SELECT 1 FROM variants WHERE base_id=? LIMIT 1", (media_id,))
         return row is not None
 
+    def stacked_base_paths(self, paths: list[str]) -> set[str]:
+        """
+        The subset of paths that are the base of a stack, chunked like ids_for_paths.
+        """
+        out: set[str] = set()
+        for i in range(0, len(paths), _SQL_CHUNK):
+            chunk = paths[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            rows = self.cur.execute(
+                f"SELECT DISTINCT m.path FROM media m JOIN variants v ON v.base_id = m.id WHERE m.path IN ({q})",
+                chunk,
+            ).fetchall()
+            out.update(r["path"] for r in rows)
+        return out
+
     def detect_and_stack(self, media_id: int, path: str) -> None:
         p = Path(path)
         m = _VARIANT_RE.match(p.stem)
@@ -151,7 +241,7 @@ class MediaDAO(BaseManager):
 
         # look for any _vN already in DB
         base_stem = p.stem
-        like_pattern = f"{base_stem}_v%{p.suffix}"
+        like_pattern = str(p.with_name(f"{base_stem}_v%{p.suffix}"))
         rows = self.fetchall("SELECT id, path FROM media WHERE path LIKE ?", (like_pattern,))
         for v_id, v_path in rows:
             m2 = _VARIANT_RE.match(Path(v_path).stem)
@@ -159,6 +249,70 @@ class MediaDAO(BaseManager):
                 _, idx2 = m2.groups()
                 self.add_variant(media_id, v_id, int(idx2))
 
+    def stack_variants_many(self, items: list[tuple[int, str]]) -> int:
+        """
+        Batch detect_and_stack: group new files and their on-record siblings by (folder, base stem, suffix)
+        in memory and write every base/variant pair in one executemany.
+        :param items: (media_id, path) of newly added files
+        :return: Number of variant rows written
+        """
+        if not items:
+            return 0
+        new_ids = {mid for mid, _ in items}
+        known = {path: mid for mid, path in items}
+        parsed = {path: _split_variant(path) for path in known}
+
+        # siblings already on record: bases of new variants, and variants of new (potential) bases
+        base_paths, prefixes = [], []
+        for folder, stem, suffix, m in parsed.values():
+            if m:
+                base_paths.append(os.path.join(folder, m.group(1) + suffix))
+            prefixes.append(os.path.join(folder, stem))
+        siblings = self.ids_for_paths([p for p in base_paths if p not in known])
+        siblings.update(self._variant_candidates(prefixes))
+        for path, mid in siblings.items():
+            if path not in known:
+                known[path] = mid
+                parsed[path] = _split_variant(path)
+
+        bases: dict[tuple[str, str, str], int] = {}
+        variants: dict[tuple[str, str, str], list[tuple[int, int]]] = {}
+        for path, (folder, stem, suffix, m) in parsed.items():
+            mid = known[path]
+            bases[(folder, stem, suffix)] = mid
+            if m:
+                variants.setdefault((folder, m.group(1), suffix), []).append((mid, int(m.group(2))))
+
+        rows = [
+            (base_id, v_id, rank)
+            for key, members in variants.items()
+            if (base_id := bases.get(key)) is not None
+            for v_id, rank in members
+            if base_id in new_ids or v_id in new_ids
+        ]
+        if rows:
+            with self.transaction():
+                self.cur.executemany(
+                    "INSERT OR IGNORE INTO variants(base_id, variant_id, rank) VALUES (?,?,?)", rows
+                )
+        return len(rows)
+
+    def _variant_candidates(self, prefixes: list[str]) -> dict[str, int]:
+        """
+        {path: id} for files whose path starts with '<prefix>_v' / '<prefix>_V', as OR-ed index range scans.
+        """
+        ranges = [(p + tag, p + tag[:-1] + chr(ord(tag[-1]) + 1)) for p in prefixes for tag in ("_v", "_V")]
+        out: dict[str, int] = {}
+        step = _SQL_CHUNK // 2
+        for i in range(0, len(ranges), step):
+            chunk = ranges[i: i + step]
+            where = " OR ".join("(path >= ? AND path < ?)" for _ in chunk)
+            rows = self.cur.execute(
+                f"SELECT id, path FROM media WHERE {where}", [b for r in chunk for b in r]
+            ).fetchall()
+            out.update((r["path"], r["id"]) for r in rows)
+        return out
+
     def stack_ids_for_base(self, base_id: int) -> List[int]:
         logger.debug(f"Getting base ids for {base_id}")
         rows = self.cur.execute(
@@ -203,6 +357,16 @@ class MediaDAO(BaseManager):
         self.cur.execute(sql)
         return [r["path"] for r in self.cur.fetchall()]
 
+    def sorted_ids(self, sort_key: str, ascending: bool = True, *, files_only: bool = True) -> array:
+        """
+        Every media id in get_sorted_paths order, as a compact array: a library-wide result set
+        without a Python string per row.
+        """
+        clause = _SORT_SQL.get((sort_key, ascending), _SORT_SQL[("name", True)])
+        where = "WHERE is_dir=0" if files_only else ""
+        self.cur.execute(f"SELECT id FROM media {where} {clause};")
+        return array("q", (r["id"] for r in self.cur))
+
     def order_subset(self, subset: list[str], sort_key: str, asc: bool) -> list[str]:
         if not subset:
             return []
@@ -212,9 +376,8 @@ class MediaDAO(BaseManager):
 
         clause = _SORT_SQL.get((sort_key, asc), _SORT_SQL[("name", True)])
         ordered: list[str] = []
-        CHUNK = 900
-        for i in range(0, len(subset), CHUNK):
-            chunk = subset[i: i + CHUNK]
+        for i in range(0, len(subset), _SQL_CHUNK):
+            chunk = subset[i: i + _SQL_CHUNK]
             ph = ", ".join("?" for _ in chunk)
             sql = f"SELECT path FROM media WHERE path IN ({ph}) {clause};"
             self.cur.execute(sql, chunk)
@@ -223,6 +386,348 @@ class MediaDAO(BaseManager):
         missing = [p for p in subset if p not in ordered]
         return ordered + missing
 
+    # ------------------------------ Scan cache ------------------------------
+    def scan_dir_cache(self, root: str) -> dict[str, tuple[int | None, list[str]]]:
+        """
+        Return {dir: (mtime_ns, [child dirs])} for root and everything recorded below it.
+        """
+        lo, hi = _prefix_range(root)
+        rows = self.cur.execute(
+            "SELECT path, parent, mtime FROM scan_dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, lo, hi),
+        ).fetchall()
+        cache: dict[str, tuple[int | None, list[str]]] = {r["path"]: (r["mtime"], []) for r in rows}
+        for r in rows:
+            parent = cache.get(r["parent"])
+            if parent is not None and r["path"] != root:
+                parent[1].append(r["path"])
+        return cache
+
+    def record_scanned_dirs(self, records) -> None:
+        """
+        Persist ScanDir fingerprints for freshly listed directories. Newly seen sub-folders are added
+        with a NULL mtime so they are listed next time, vanished ones are dropped with their subtree.
+        """
+        if not records:
+            return
+        now = int(time.time())
+        with self.transaction():
+            self.cur.executemany(
+                """
+                INSERT INTO scan_dirs(path, parent, mtime, entry_count, scanned)
+                VALUES (?,?,?,?,?)
+                ON CONFLICT(path) DO UPDATE SET parent=excluded.parent, mtime=excluded.mtime,
+                    entry_count=excluded.entry_count, scanned=excluded.scanned
+                """,
+                [(r.path, r.parent, r.mtime, r.entry_count, now) for r in records],
+            )
+            self.cur.executemany(
+                "INSERT OR IGNORE INTO scan_dirs(path, parent) VALUES (?,?)",
+                [(sub, r.path) for r in records for sub in r.subdirs],
+            )
+            for r in records:
+                known = self.cur.execute("SELECT path FROM scan_dirs WHERE parent = ?", (r.path,)).fetchall()
+                for gone in {k["path"] for k in known} - set(r.subdirs):
+                    lo, hi = _prefix_range(gone)
+                    self.cur.execute(
+                        "DELETE FROM scan_dirs WHERE path = ? OR (path >= ? AND path < ?)", (gone, lo, hi)
+                    )
+
+    def scan_dir_entries(self, folders: list[str]) -> dict[str, tuple[int | None, list[str]]]:
+        """
+        scan_dir_cache shape for an explicit set of directories (no recursion).
+        """
+        cache: dict[str, tuple[int | None, list[str]]] = {}
+        for i in range(0, len(folders), _SQL_CHUNK):
+            chunk = folders[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            for r in self.cur.execute(f"SELECT path, mtime FROM scan_dirs WHERE path IN ({q})", chunk).fetchall():
+                cache[r["path"]] = (r["mtime"], [])
+            for r in self.cur.execute(f"SELECT path, parent FROM scan_dirs WHERE parent IN ({q})", chunk).fetchall():
+                if r["parent"] in cache:
+                    cache[r["parent"]][1].append(r["path"])
+        return cache
+
+    def folder_listing(self, folder: str) -> list[tuple[str, bool, str, int, int | None]] | None:
+        """
+        Direct children of folder as recorded, (path, is_dir, type, byte_size, mtime) per row, through
+        the media.parent index. Sub-folders known only to scan_dirs (no media below them) are included.
+        :return: None if folder was never listed by an import / sync, the caller has to go to disk
+        """
+        key = folder.rstrip("/\\")  # media.parent form, see db_utils.ensure_media_parent_schema
+        folder = key or folder  # scan_dirs keeps the filesystem root as is
+        listed = self.fetchone("SELECT 1 FROM scan_dirs WHERE path = ? AND scanned IS NOT NULL", (folder,))
+        if listed is None:
+            return None
+        rows = self.cur.execute(
+            "SELECT path, is_dir, type, byte_size, mtime FROM media WHERE parent = ?", (key,)
+        ).fetchall()
+        out = [(r["path"], bool(r["is_dir"]), r["type"], r["byte_size"] or 0, r["mtime"]) for r in rows]
+        seen = {r[0] for r in out}
+        for r in self.cur.execute("SELECT path, mtime FROM scan_dirs WHERE parent = ?", (folder,)).fetchall():
+            if r["path"] not in seen:
+                out.append((r["path"], True, "dir", 0, r["mtime"]))
+        return out
+
+    # ------------------------------ Removal ------------------------------
+    def media_in_dir(self, folder: str, *, files_only: bool = True) -> list[str]:
+        """
+        Paths recorded directly inside folder (non-recursive).
+        """
+        sql = "SELECT path FROM media WHERE parent = ?"  # idx_media_parent, no subtree scan
+        if files_only:
+            sql += " AND is_dir = 0"
+        return [r["path"] for r in self.cur.execute(sql, (folder.rstrip("/\\"),)).fetchall()]
+
+    def delete_media_paths(self, paths: list[str]) -> None:
+        """
+        Drop media rows, tags / comments / variants / presets cascade with them.
+        """
+        with self.transaction():
+            for i in range(0, len(paths), _SQL_CHUNK):
+                chunk = paths[i: i + _SQL_CHUNK]
+                q = ",".join("?" * len(chunk))
+                self.cur.execute(f"DELETE FROM media WHERE path IN ({q})", chunk)
+
+    def remove_tree(self, folder: str) -> list[str]:
+        """
+        Forget a directory that vanished from disk: its media rows, everything below it and its scan cache.
+        :return: File paths that were removed
+        """
+        lo, hi = _prefix_range(folder)
+        where = "(path = ? OR (path >= ? AND path < ?))"
+        removed = [
+            r["path"] for r in self.cur.execute(
+                f"SELECT path FROM media WHERE is_dir = 0 AND {where}", (folder, lo, hi)
+            ).fetchall()
+        ]
+        with self.transaction():
+            self.cur.execute(f"DELETE FROM media WHERE {where}", (folder, lo, hi))
+            self.cur.execute(f"DELETE FROM scan_dirs WHERE {where}", (folder, lo, hi))
+        return removed
+
+    def move_tree(self, old: str, new: str) -> list[tuple[str, str]]:
+        """
+        Re-point a renamed / moved directory and everything below it, keeping ids (and so tags etc.).
+        :return: (old, new) pairs for the files that moved
+        """
+        lo, hi = _prefix_range(old)
+        where = "(path = ? OR (path >= ? AND path < ?))"
+        moved = [
+            (r["path"], new + r["path"][len(old):]) for r in self.cur.execute(
+                f"SELECT path FROM media WHERE is_dir = 0 AND {where}", (old, lo, hi)
+            ).fetchall()
+        ]
+        with self.transaction():
+            self.cur.execute(
+                f"UPDATE media SET path = ? || substr(path, ?) WHERE {where}", (new, len(old) + 1, old, lo, hi)
+            )
+            self.cur.execute(
+                f"UPDATE scan_dirs SET path = ? || substr(path, ?), parent = ? || substr(parent, ?) WHERE {where}",
+                (new, len(old) + 1, new, len(old) + 1, old, lo, hi),
+            )
+            # the moved root keeps its old parent pointer, fix it up
+            self.cur.execute("UPDATE scan_dirs SET parent = ? WHERE path = ?", (os.path.dirname(new), new))
+        return moved
+
+    # ------------------------------ Content hashes ------------------------------
+    def stale_hash_rows(self, limit: int) -> list[tuple[int, str, int, int]]:
+        """
+        Up to limit (id, path, byte_size, mtime) files with no hash, or whose size / mtime changed since hashing.
+        """
+        rows = self.cur.execute(
+            """
+            SELECT m.id, m.path, m.byte_size, m.mtime
+            FROM   media m LEFT JOIN media_hashes h ON h.media_id = m.id
+            WHERE  m.is_dir = 0
+              AND  (h.media_id IS NULL OR h.byte_size IS NOT m.byte_size OR h.mtime IS NOT m.mtime)
+            LIMIT  ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [(r["id"], r["path"], r["byte_size"], r["mtime"]) for r in rows]
+
+    def count_stale_hashes(self) -> int:
+        return self.cur.execute(
+            """
+            SELECT COUNT(*) FROM media m LEFT JOIN media_hashes h ON h.media_id = m.id
+            WHERE  m.is_dir = 0
+              AND  (h.media_id IS NULL OR h.byte_size IS NOT m.byte_size OR h.mtime IS NOT m.mtime)
+            """
+        ).fetchone()[0]
+
+    def set_partial_hashes(self, rows: list[tuple[int, int, int, str | None]]) -> None:
+        """
+        Upsert (media_id, byte_size, mtime, partial); any previous full hash is dropped.
+        """
+        with self.transaction():
+            self.cur.executemany(
+                """
+                INSERT INTO media_hashes(media_id, byte_size, mtime, partial, full) VALUES (?,?,?,?,NULL)
+                ON CONFLICT(media_id) DO UPDATE SET byte_size=excluded.byte_size, mtime=excluded.mtime,
+                    partial=excluded.partial, full=NULL
+                """,
+                rows,
+            )
+
+    def partial_collisions_missing_full(self, limit: int) -> list[tuple[int, str]]:
+        """
+        Up to limit (id, path) whose partial hash is shared with another file but that have no full hash yet.
+        """
+        rows = self.cur.execute(
+            """
+            SELECT m.id, m.path
+            FROM   media_hashes h JOIN media m ON m.id = h.media_id
+            WHERE  h.full IS NULL
+              AND  h.partial IN (SELECT partial FROM media_hashes WHERE partial IS NOT NULL
+                                 GROUP BY partial HAVING COUNT(*) > 1)
+            LIMIT  ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [(r["id"], r["path"]) for r in rows]
+
+    def set_full_hashes(self, rows: list[tuple[str, int]]) -> None:
+        """
+        rows are (full, media_id). Unreadable files store '' so they are not retried every run.
+        """
+        with self.transaction():
+            self.cur.executemany("UPDATE media_hashes SET full=? WHERE media_id=?", rows)
+
+    def duplicate_groups(self) -> list[list[str]]:
+        """
+        Paths of byte-identical files, one list per content hash (largest files first).
+        """
+        rows = self.cur.execute(
+            """
+            SELECT h.full, m.path
+            FROM   media_hashes h JOIN media m ON m.id = h.media_id
+            WHERE  h.full IN (SELECT full FROM media_hashes WHERE full IS NOT NULL AND full <> ''
+                              GROUP BY full HAVING COUNT(*) > 1)
+            ORDER  BY h.byte_size DESC, h.full, m.path
+            """
+        ).fetchall()
+        groups: dict[str, list[str]] = {}
+        for r in rows:
+            groups.setdefault(r["full"], []).append(r["path"])
+        return list(groups.values())
+
+    # ------------------------------ Perceptual hashes ------------------------------
+    def set_phashes(self, rows: list[tuple[int, str]]) -> None:
+        """
+        Upsert (phash, path) pairs, phash already converted to a signed 64 bit value.
+        """
+        with self.transaction():
+            self.cur.executemany(
+                """
+                INSERT INTO media_phash(media_id, phash) SELECT id, ? FROM media WHERE path = ?
+                ON CONFLICT(media_id) DO UPDATE SET phash=excluded.phash
+                """,
+                rows,
+            )
+
+    def all_phashes(self) -> list[tuple[int, int]]:
+        """
+        Every stored (media_id, phash), phash as stored (signed).
+        """
+        return [(r[0], r[1]) for r in self.cur.execute("SELECT media_id, phash FROM media_phash")]
+
+    def phash_for_path(self, path: str) -> int | None:
+        row = self.fetchone(
+            "SELECT h.phash FROM media_phash h JOIN media m ON m.id = h.media_id WHERE m.path=?", (path,)
+        )
+        return row["phash"] if row else None
+
+    def paths_for_ids(self, ids: list[int]) -> dict[int, str]:
+        """
+        Return {id: path} for the given ids, chunked like ids_for_paths. Unknown ids are left out.
+        """
+        out: dict[int, str] = {}
+        for i in range(0, len(ids), _SQL_CHUNK):
+            chunk = ids[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            rows = self.cur.execute(f"SELECT id, path FROM media WHERE id IN ({q})", chunk).fetchall()
+            out.update((r["id"], r["path"]) for r in rows)
+        return out
+
+    def folder_and_variant_ids(self) -> set[int]:
+        """
+        Ids the viewer steps over: folders and every non-base member of a stack (see is_variant).
+        """
+        rows = self.cur.execute("SELECT id FROM media WHERE is_dir = 1 UNION SELECT variant_id FROM variants")
+        return {r["id"] for r in rows.fetchall()}
+
+    def media_rows_for_ids(self, ids: list[int]) -> dict[int, tuple[str, bool, bool]]:
+        """
+        Return {id: (path, is_dir, is stack base)} for the given ids, what a list model needs to paint
+        a row. Chunked like ids_for_paths, unknown ids are left out.
+        """
+        out: dict[int, tuple[str, bool, bool]] = {}
+        for i in range(0, len(ids), _SQL_CHUNK):
+            chunk = ids[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            rows = self.cur.execute(
+                f"SELECT m.id, m.path, m.is_dir, EXISTS(SELECT 1 FROM variants v WHERE v.base_id = m.id) AS stacked "
+                f"FROM media m WHERE m.id IN ({q})",
+                chunk,
+            ).fetchall()
+            out.update((r["id"], (r["path"], bool(r["is_dir"]), bool(r["stacked"]))) for r in rows)
+        return out
+
+    # ------------------------------ Video probes ------------------------------
+    def video_probe(self, path: str) -> tuple[int, float, int, int] | None:
+        """
+        (duration_ms, fps, width, height) for path, None if never probed or the file changed since.
+        """
+        row = self.fetchone(
+            """
+            SELECT p.duration_ms, p.fps, p.width, p.height
+            FROM   video_probe p JOIN media m ON m.id = p.media_id
+            WHERE  m.path = ? AND p.mtime IS m.mtime
+            """,
+            (path,),
+        )
+        return tuple(row) if row else None
+
+    def set_video_probe(self, path: str, duration_ms: int, fps: float, width: int, height: int) -> None:
+        with self.transaction():
+            self.cur.execute(
+                """
+                INSERT OR REPLACE INTO video_probe(media_id, mtime, duration_ms, fps, width, height)
+                SELECT id, mtime, ?, ?, ?, ? FROM media WHERE path = ?
+                """,
+                (duration_ms, fps, width, height, path),
+            )
+
+    # ------------------------------ Thumbnail warm-up ------------------------------
+    def queue_thumb_warm(self, ids: Iterable[int]) -> None:
+        """
+        Queue media for background thumbnailing, runs inside the caller's transaction.
+        """
+        self.cur.executemany("INSERT OR IGNORE INTO thumb_warm(media_id) VALUES (?)", ((i,) for i in ids))
+
+    def thumb_warm_batch(self, limit: int) -> list[tuple[int, str]]:
+        """
+        Up to limit queued (id, path) files, in path order so a folder is warmed together.
+        """
+        rows = self.cur.execute(
+            """
+            SELECT m.id, m.path FROM thumb_warm w JOIN media m ON m.id = w.media_id
+            ORDER BY m.path LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [(r["id"], r["path"]) for r in rows]
+
+    def count_thumb_warm(self) -> int:
+        return self.cur.execute(
+            "SELECT COUNT(*) FROM thumb_warm w JOIN media m ON m.id = w.media_id"
+        ).fetchone()[0]
+
+    def drop_thumb_warm(self, ids: list[int]) -> None:
+        with self.transaction():
+            self.cur.executemany("DELETE FROM thumb_warm WHERE media_id=?", ((i,) for i in ids))
+
     # ------------------------------ Universal Helpers ------------------------------
     def all_paths(self, *, files_only: bool = True) -> list[str]:
         logger.debug(f"Obtaining all paths, files_only: {files_only}")
@@ -291,7 +796,7 @@ class MediaDAO(BaseManager):
     # ------------------------------ Comments ------------------------------
 
     def add_comment(self, media_id: int, text: str, seq: int) -> int:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "INSERT INTO comments(media_id, text, seq) VALUES (?,?,?)",
                 (media_id, text.strip(), seq)
@@ -299,7 +804,7 @@ class MediaDAO(BaseManager):
         return self.cur.lastrowid
 
     def list_comments(self, media_id: int) -> list[dict]:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "SELECT id, created, text, seq FROM comments "
                 "WHERE media_id=? ORDER BY seq", (media_id,)
@@ -307,11 +812,11 @@ class MediaDAO(BaseManager):
         return [dict(r) for r in self.cur.fetchall()]
 
     def delete_comment(self, comment_id: int) -> None:
-        with self.conn:
+        with self.transaction():
             self.cur.execute("DELETE FROM comments WHERE id=?", (comment_id,))
 
     def update_comment(self, comment_id: int, text: str) -> int:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "UPDATE comments SET text=? WHERE id=?", (text, comment_id)
             )
@@ -328,7 +833,7 @@ class MediaDAO(BaseManager):
             f"SET seq = CASE id {cases} END "
             f"WHERE id IN ({ids}) AND media_id=?"
         )
-        with self.conn:
+        with self.transaction():
             self.cur.execute(sql, (media_id,))
 
     def bookmarks_for_path(self, path: str) -> list[int]:
@@ -338,14 +843,14 @@ class MediaDAO(BaseManager):
         return [r["time_ms"] for r in rows]
 
     def add_bookmark(self, path: str, ms: int) -> None:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "INSERT OR IGNORE INTO bookmarks(path, time_ms) VALUES (?, ?)",
                 (path, ms),
             )
 
     def delete_bookmark(self, path: str, ms: int) -> None:
-        with self.conn:
+        with self.transaction():
             self.cur.execute(
                 "DELETE FROM bookmarks WHERE path = ? AND time_ms = ?",
                 (path, ms),
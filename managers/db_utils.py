@@ -41,7 +41,8 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
                 artist    TEXT,
                 type      TEXT    NOT NULL,
                 inode     INTEGER,
-                mtime     INTEGER
+                mtime     INTEGER,
+                parent    TEXT
                             
             );
 
@@ -95,6 +96,13 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
 
     # ALWAYS ensure variants table/indexes exist (upgrade path)
     ensure_variants_schema(conn)
+    ensure_scan_dirs_schema(conn)
+    ensure_hashes_schema(conn)
+    ensure_phash_schema(conn)
+    ensure_video_probe_schema(conn)
+    ensure_thumb_warm_schema(conn)
+    ensure_media_sort_schema(conn)
+    ensure_media_parent_schema(conn)
     logger.debug("Schema verified / upgraded")
 
 
@@ -119,6 +127,139 @@ def ensure_variants_schema(conn) -> None:
     conn.commit()
 
 
+def ensure_scan_dirs_schema(conn) -> None:
+    """
+    Per-directory fingerprints from the last import, lets re-scans skip unchanged folders.
+    Rows with a NULL mtime are known sub-folders that have not been listed yet.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_dirs (
+            path         TEXT PRIMARY KEY,
+            parent       TEXT,
+            mtime        INTEGER,
+            entry_count  INTEGER DEFAULT 0,
+            scanned      INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scan_dirs_parent ON scan_dirs(parent)")
+    conn.commit()
+
+
+def ensure_hashes_schema(conn) -> None:
+    """
+    Content hashes for duplicate detection. byte_size / mtime are the media values the hashes were
+    computed for, a mismatch means the row is stale. full is only filled when partial collides.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS media_hashes (
+            media_id   INTEGER PRIMARY KEY,
+            byte_size  INTEGER,
+            mtime      INTEGER,
+            partial    TEXT,
+            full       TEXT,
+            FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_hashes_partial ON media_hashes(partial)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_hashes_full ON media_hashes(full)")
+    conn.commit()
+
+
+def ensure_media_sort_schema(conn) -> None:
+    """
+    Indexes matching the name / date sort clauses, so listing the whole library in order is an index scan.
+    """
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_lower_path ON media(LOWER(path))")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_added ON media(added)")
+    conn.commit()
+
+
+def _sql_parent(col: str) -> str:
+    """
+    SQL for the directory part of a path column: cut the last component, then the trailing separators.
+    No trailing separator, like the folder keys dao._prefix_range builds ("/" itself becomes "").
+    """
+    return f"rtrim(rtrim({col}, replace(replace({col}, '/', ''), '\\', '')), '/\\')"
+
+
+def ensure_media_parent_schema(conn) -> None:
+    """
+    media.parent, the containing directory, indexed so listing a folder is one lookup.
+    Filled by triggers, every writer of media.path (imports, renames, move_tree) keeps it right for free.
+    """
+    cur = conn.cursor()
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(media)").fetchall()}
+    if "parent" not in cols:
+        logger.info("Adding media.parent, back-filling existing rows")
+        cur.execute("ALTER TABLE media ADD COLUMN parent TEXT")
+    cur.execute(f"UPDATE media SET parent = {_sql_parent('path')} WHERE parent IS NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_parent ON media(parent)")
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS media_parent_insert AFTER INSERT ON media
+        BEGIN
+            UPDATE media SET parent = {_sql_parent('NEW.path')} WHERE id = NEW.id;
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS media_parent_update AFTER UPDATE OF path ON media
+        BEGIN
+            UPDATE media SET parent = {_sql_parent('NEW.path')} WHERE id = NEW.id;
+        END
+    """)
+    conn.commit()
+
+
+def ensure_phash_schema(conn) -> None:
+    """
+    Perceptual (difference) hashes taken from generated thumbnails, stored as signed 64 bit integers.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS media_phash (
+            media_id  INTEGER PRIMARY KEY,
+            phash     INTEGER NOT NULL,
+            FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+        )
+    """)
+    conn.commit()
+
+
+def ensure_video_probe_schema(conn) -> None:
+    """
+    Container facts read by the video thumbnailer, valid while media.mtime still equals mtime.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_probe (
+            media_id     INTEGER PRIMARY KEY,
+            mtime        INTEGER,
+            duration_ms  INTEGER,
+            fps          REAL,
+            width        INTEGER,
+            height       INTEGER,
+            FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+        )
+    """)
+    conn.commit()
+
+
+def ensure_thumb_warm_schema(conn) -> None:
+    """
+    Files imported but not thumbnailed yet, drained in the background and kept across restarts.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS thumb_warm (
+            media_id  INTEGER PRIMARY KEY,
+            FOREIGN KEY(media_id) REFERENCES media(id) ON DELETE CASCADE
+        )
+    """)
+    conn.commit()
+
+
 def get_db_connection(*, db_path: Optional[str | os.PathLike] = None, backend: Optional[str] = None, ) \
         -> "sqlite3.Connection | psycopg2.extensions.connection":
     """
@@ -155,6 +296,17 @@ def get_db_connection(*, db_path: Optional[str | os.PathLike] = None, backend: O
     return conn
 
 
+def connection_path(conn: sqlite3.Connection) -> str | None:
+    """
+    Return the file backing conn's main database, or None for in-memory / temp DBs.
+    Used to open extra per-thread connections to the same SQLite file.
+    """
+    for row in conn.execute("PRAGMA database_list"):
+        if row[1] == "main":
+            return row[2] or None
+    return None
+
+
 def generate_insert_sql(
         table: str,
         columns: Sequence[str],
@@ -1,55 +1,38 @@
 from __future__ import annotations
 
 import logging
-from collections import deque
+from array import array
 from pathlib import Path
-from typing import List
+from typing import Callable, List
 
-from PySide6.QtCore import QObject, Signal, QThreadPool, Qt
-from PySide6.QtGui import QPixmap, QPainter, QColor, QFont
+from PySide6.QtCore import QObject, Signal, QThreadPool, QTimer
+from PySide6.QtGui import QPixmap
 
 from services.comment_service import CommentService
+from services.folder_listing_service import FolderEntry, FolderListingService
 from services.rename_service import RenameService
 from services.variant_service import VariantService
 from services.import_service import ImportService
+from services.watch_service import WatchService
+from services.similarity_service import SimilarityService
+from services.thumb_delivery import ThumbDelivery
+from services.thumb_scheduler import ThumbScheduler, TIER_VISIBLE
+from services.thumb_warmup_service import ThumbWarmupService
 
-from workers.thumb_worker import ThumbWorker
+from workers.hash_worker import HashWorker
+from workers.thumb_worker import ThumbWorker, ThumbPrefetchWorker, ThumbResult, VideoProbe, VIDEO_SUFFIXES
 
 from .dao import MediaDAO
-from .utils.thumb_cache import ThumbCache
-
-MEDIA_EXT = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".mp4", ".mkv", ".webm", ".mov", ".avi"}
-logger = logging.getLogger(__name__)
+from .db_utils import connection_path
+from .utils.disk_thumb_cache import DiskThumbCache
+from .utils.thumb_cache import ThumbCache, default_budget, physical_ram
 
+# screenfuls of thumbnails the memory cache keeps at least, whatever the preset
+THUMB_CACHE_SCREENS = 8
+# thumbnail cache / scheduler counters are logged this often (debug level), when they moved
+THUMB_STATS_MS = 60_000
 
-def decorate_stack_badge(base: QPixmap) -> QPixmap:
-    """
-    Paint a small purple 'S' badge in the bottom right corner
-    :param base:
-    :return: New QPixmap (leaves original untouched)
-    """
-    badge = max(12, base.width() // 6)  # scale with thumb
-    result = QPixmap(base)  # shallow copy
-    painter = QPainter(result)
-
-    # circle
-    radius = badge // 2
-    x = base.width() - badge - 2
-    y = base.height() - badge - 2
-    painter.setBrush(QColor("#5e5eff"))
-    painter.setPen(Qt.NoPen)
-    painter.drawEllipse(x, y, badge, badge)
-
-    # white 'S'
-    painter.setPen(Qt.white)
-    f = QFont()
-    f.setBold(True)
-    f.setPixelSize(badge - 4)
-    painter.setFont(f)
-    painter.drawText(x, y, badge, badge, Qt.AlignCenter, "S")
-
-    painter.end()
-    return result
+logger = logging.getLogger(__name__)
 
 
 class MediaManager(QObject):
@@ -58,9 +41,13 @@ class MediaManager(QObject):
     """
 
     scan_finished = Signal(list)
-    thumb_ready = Signal(str, object)
     renamed = Signal(str, str)
     import_finished = Signal(object)
+    import_progress = Signal(object)
+    media_changed = Signal(object)
+    hashing_progress = Signal(int, int)  # files hashed, files to hash
+    hashing_finished = Signal(object)
+    similar_found = Signal(str, list)  # query path, similar paths closest first
 
     def __init__(self, conn, undo_manager, thumb_size: int = 256, parent=None):
         QObject.__init__(self, parent)
@@ -78,10 +65,38 @@ class MediaManager(QObject):
         self.undo_manager = undo_manager
 
         self.importer.import_completed.connect(self.import_finished)
+        self.importer.import_progress.connect(self.import_progress)
+
+        self._hashing = False
+        self._hash_again = False  # files arrived during the running pass
+        self.watcher = WatchService(self.dao, self.pool, self)
+        self.watcher.media_changed.connect(self.media_changed)
+        self.watcher.media_changed.connect(self._on_media_synced)
+        self.listing = FolderListingService(self.dao, self.watcher, self)
+        self.importer.import_completed.connect(self._on_import_completed)
         self.rename_service.renamed.connect(self.renamed)
 
         self.thumb_size = thumb_size
-        self.cache = ThumbCache(capacity=512)
+        self.cache = ThumbCache(default_budget())
+        self._view_bytes: dict[str, int] = {}
+        # thumbnail subscriptions: each view (owner) only receives the paths it shows, at its level
+        self._views: dict[str, tuple[int, Callable[[dict[str, QPixmap]], None]]] = {}  # owner -> (size, on_ready)
+        self._shown: dict[str, set[str]] = {}  # owner -> paths
+        self._viewers_of: dict[str, set[str]] = {}  # path -> owners
+        # requests are queued by visibility and only a pool's worth of ThumbWorkers run at once,
+        # a path already queued / running is never decoded twice
+        self.thumbs = ThumbScheduler(self._start_thumb, self.pool.maxThreadCount())
+        # finished jobs reach the GUI thread in frame-sized batches, not one event each
+        self.delivery = ThumbDelivery(self._on_thumbs_delivered, self)
+        self.disk_cache = DiskThumbCache()
+        self._stats_seen = -1
+        self._stats_timer = QTimer(self)
+        self._stats_timer.timeout.connect(self._log_thumb_stats)
+        self._stats_timer.start(THUMB_STATS_MS)
+        self.similarity = SimilarityService(self.dao, thumb_size, self)
+        # imported files are thumbnailed into the disk cache in the background while the user is idle
+        self.warmup = ThumbWarmupService(self.dao, self.pool, self.disk_cache, thumb_size,
+                                         self.similarity.record, self)
 
         logger.info("Media manager initialized")
 
@@ -104,13 +119,83 @@ class MediaManager(QObject):
         row = self.dao.fetchone("SELECT id FROM media WHERE path=?", (path,))
         return row["id"] if row else None
 
-    def scan_folder(self, folder: str | Path) -> None:
+    def scan_folder(self, folder: str | Path, *, incremental: bool = True) -> None:
         """
-        Begin an async scan; results arrive in _on_scan_completed().
+        Begin an async scan; results arrive through import_progress / import_finished.
         :param folder:
+        :param incremental: If False, every directory is listed even if its mtime is unchanged
         :return:
         """
-        self.importer.scan(Path(folder))
+        self.importer.scan(Path(folder), incremental=incremental)
+
+    def rescan_roots(self) -> list[str]:
+        """
+        Incrementally re-scan every known root, only changed subtrees are listed. Roots are imported
+        one after another, each reports its own import_finished.
+        :return: The roots that were queued
+        """
+        roots = self.root_folders()
+        for root in roots:
+            self.importer.scan(Path(root), incremental=True)
+        return roots
+
+    def watch_roots(self) -> None:
+        """
+        Start live syncing of every imported root, changes arrive through media_changed.
+        """
+        self.watcher.watch_roots(self.root_folders())
+
+    def _on_import_completed(self, summary) -> None:
+        self.watcher.watch_roots([str(summary.root)])
+        self.hash_library()  # also catches files an earlier, interrupted pass left unhashed
+        if summary.added:
+            self.warmup.start()
+
+    def _on_media_synced(self, result) -> None:
+        if result.added:
+            self.hash_library()
+
+    def hash_library(self) -> None:
+        """
+        Start a background content-hash pass, only new or changed files are read. Called while a pass
+        runs, another one follows it. Progress arrives through hashing_progress, completion through
+        hashing_finished, results through duplicate_groups().
+        """
+        db_path = connection_path(self.dao.conn)
+        if db_path is None:
+            return
+        if self._hashing:
+            self._hash_again = True
+            return
+        self._hashing = True
+        worker = HashWorker(db_path)
+        worker.progress.connect(self.hashing_progress)
+        worker.finished.connect(self._on_hashing_finished)
+        self.pool.start(worker, -1)  # below thumbnails / imports
+
+    def is_hashing(self) -> bool:
+        return self._hashing
+
+    def _on_hashing_finished(self, summary) -> None:
+        self._hashing = False
+        self.hashing_finished.emit(summary)
+        if self._hash_again:
+            self._hash_again = False
+            self.hash_library()
+
+    def duplicate_groups(self) -> list[list[str]]:
+        """
+        :return: Lists of paths whose contents are byte-identical
+        """
+        return self.dao.duplicate_groups()
+
+    def find_similar(self, path: str) -> list[str]:
+        """
+        Near-duplicates of path (re-encodes, resizes) by perceptual hash, also emitted as similar_found.
+        """
+        found = self.similarity.similar(path)
+        self.similar_found.emit(path, found)
+        return found
 
     # ----------------------------- Path Getters -----------------------------
 
@@ -122,6 +207,15 @@ class MediaManager(QObject):
         """
         return self.dao.all_paths(files_only=files_only)
 
+    def list_folder(self, folder: str) -> list[FolderEntry] | None:
+        """
+        Sub-folders and media directly inside folder, from the DB when it was imported (reconciled with
+        disk in the background, changes arrive as media_changed), else from one pass over the folder.
+        :param folder: Absolute folder path
+        :return: None if folder is not a readable directory
+        """
+        return self.listing.list_folder(folder)
+
     def folder_paths(self) -> list[str]:
         return self.dao.folder_paths()
 
@@ -138,6 +232,29 @@ class MediaManager(QObject):
     def folder_for_id(self, media_id: int) -> Path | None:
         return self.dao.folder_for_id(media_id)
 
+    def ids_in_order(self, paths: list[str]) -> array:
+        """
+        Media ids of paths as a compact array, in the given order. Paths not in the DB are dropped.
+        """
+        ids = self.dao.ids_for_paths(paths)
+        return array("q", (ids[p] for p in paths if p in ids))
+
+    def navigation_ids(self, ids: array) -> array:
+        """
+        ids without folders and variants, in order: the viewer's Left/Right list for a result set.
+        One query for the excluded ids instead of is_variant() per row.
+        """
+        skip = self.dao.folder_and_variant_ids()
+        return array("q", (i for i in ids if i not in skip))
+
+    def media_rows(self, ids: list[int]) -> dict[int, tuple[str, bool, bool]]:
+        """
+        {id: (path, is_dir, is stack base)} for the rows of an id-backed list model.
+        :param ids:
+        :return:
+        """
+        return self.dao.media_rows_for_ids(ids)
+
     # ----------------------------- Sorting -----------------------------
 
     def get_sorted_paths(self, sort_key: str, ascending: bool = True) -> list[str]:
@@ -148,6 +265,16 @@ class MediaManager(QObject):
         """
         return self.dao.get_sorted_paths(sort_key, ascending)
 
+    def sorted_ids(self, sort_key: str, ascending: bool = True, *, files_only: bool = True) -> array:
+        """
+        Every media id in get_sorted_paths() order, for listing the whole library without path strings.
+        :param sort_key: Key to sort by
+        :param ascending: Return sort in ascending order
+        :param files_only: If false, directories are listed as well
+        :return:
+        """
+        return self.dao.sorted_ids(sort_key, ascending, files_only=files_only)
+
     def order_subset(self, subset: list[str], sort_key: str, asc: bool) -> list[str]:
         """
         Return subset of paths ordered by the same criteria
@@ -187,6 +314,14 @@ class MediaManager(QObject):
         """
         return self.dao.is_stacked_base(media_id)
 
+    def stacked_bases(self, paths: list[str]) -> set[str]:
+        """
+        Which of paths are the base of a stack, one query per view for the models' stack badges.
+        :param paths:
+        :return:
+        """
+        return self.dao.stacked_base_paths(paths)
+
     def detect_and_stack(self, media_id: int, path: str) -> None:
         """
         Auto-stack when filename ends with _vN before the extension. Base file must exist without the suffix.
@@ -196,6 +331,30 @@ class MediaManager(QObject):
         """
         self.dao.detect_and_stack(media_id, path)
 
+    def similar_variant_candidates(self, path: str) -> list[str]:
+        """
+        Perceptually similar, not yet stacked files in the same folder as path.
+        """
+        return self.similarity.variant_candidates(path)
+
+    def stack_as_variants(self, base_path: str, paths: list[str]) -> int:
+        """
+        Add paths to the stack of base_path, ranked after its existing variants.
+        :return: Number of variants added
+        """
+        ids = self.dao.ids_for_paths([base_path, *paths])
+        base_id = ids.get(base_path)
+        if base_id is None:
+            return 0
+        rank = self.dao.max_variant_rank(base_id)
+        added = 0
+        for p in paths:
+            if p in ids and p != base_path:
+                rank += 1
+                self.add_variant(base_id, ids[p], rank)
+                added += 1
+        return added
+
     def _stack_ids_for_base(self, base_id: int) -> List[int]:
         return self.dao.stack_ids_for_base(base_id)
 
@@ -214,23 +373,6 @@ class MediaManager(QObject):
     def overwrite_media(self, old_abs: str, new_abs: str) -> bool:
         return self.rename_service.overwrite(old_abs, new_abs)
 
-    def walk_tree(self, root: str | Path) -> dict[str, tuple[list[str], list[str]]]:
-        logger.info("Walking tree")
-        root = Path(root).expanduser().resolve()
-        tree: dict[str, tuple[list[str], list[str]]] = {}
-        q: deque[Path] = deque([root])
-        while q:
-            folder = q.popleft()
-            sub, imgs = [], []
-            for child in folder.iterdir():
-                if child.is_dir():
-                    sub.append(str(child))
-                    q.append(child)
-                elif child.suffix.lower() in MEDIA_EXT:
-                    imgs.append(str(child))
-            tree[str(folder)] = (sub, imgs)
-        return tree
-
     # ----------------------------- Preset Management -----------------------------
     def list_presets_for_media(self, media_id: int):
         return self.dao.list_presets_for_media(media_id)
@@ -297,24 +439,172 @@ class MediaManager(QObject):
         """
         self.dao.set_attr(media_id, **kwargs)
 
-    def thumb(self, path: str | Path) -> None:
+    def thumb(self, path: str | Path, owner: str | None = None) -> None:
+        """
+        Request one thumbnail ahead of any queued view work.
+        :param owner: View that just added path (see request_thumbs), it receives the result at its level
+        """
         path = str(path)
-        cached = self.cache.get(path, self.thumb_size)
-        if cached is not None:
-            self.thumb_ready.emit(path, cached)
+        view = self._views.get(owner)
+        size = view[0] if view else self.thumb_size
+        self.warmup.touch()
+        if view:
+            self._subscribe(owner, [path])
+        hits, misses = self._split_cached([path], size)
+        if hits:
+            if view:
+                view[1](hits)
             return
+        self.thumbs.submit(None, [(path, size)], tier=TIER_VISIBLE, replace=False)
 
-        row = self.dao.fetchone("SELECT id FROM media WHERE path=?", (path,))
-        decorate = bool(row and self.is_stacked_base(row["id"]))
-
-        # worker callback does NO DB access
-        def _emit(p: str, pix: QPixmap):
-            if decorate:
-                pix = decorate_stack_badge(pix)
-            self.cache.set(p, self.thumb_size, pix)
-            self.thumb_ready.emit(p, pix)  # Qt queues to GUI thread
+    def request_thumbs(self, owner: str, paths: list[str], size: int,
+                       on_ready: Callable[[dict[str, QPixmap]], None]) -> None:
+        """
+        Subscribe a view to the thumbnails of paths and queue them in display order, replacing
+        whatever that view was subscribed to / still had queued.
+        Memory-cache hits are delivered right away, the disk-cached rest is read ahead in one pass.
+        :param owner: Stable id of the requesting view
+        :param paths: Files in row order
+        :param size: Thumbnail level the view shows (view_utils.thumb_level)
+        :param on_ready: Called on the GUI thread with {path: QPixmap} batches for this view only
+        """
+        self._unsubscribe(owner)
+        self._views[owner] = (size, on_ready)
+        self._subscribe(owner, paths)
+        self.warmup.touch()
+        hits, misses = self._split_cached(paths, size)
+        if hits:
+            on_ready(hits)
+        if misses:
+            self.pool.start(ThumbPrefetchWorker(self.disk_cache, misses, size), 1)
+        self.thumbs.submit(owner, [(p, size) for p in misses])
+
+    def add_thumbs(self, owner: str, paths: list[str]) -> None:
+        """
+        Extend a view's request_thumbs subscription without replacing it, e.g. with rows a lazily
+        loaded model just brought into view. The view's queued work is kept, paths already queued or
+        running are coalesced by the scheduler, only newly subscribed misses are read ahead.
+        :param owner: View that called request_thumbs
+        :param paths: Files still lacking a thumbnail in the view, in row order
+        """
+        view = self._views.get(owner)
+        if view is None or not paths:
+            return
+        size, on_ready = view
+        shown = self._shown.get(owner, ())
+        fresh = {p for p in paths if p not in shown}
+        self._subscribe(owner, list(fresh))
+        hits, misses = self._split_cached(paths, size)
+        if hits:
+            on_ready(hits)
+        new_misses = [p for p in misses if p in fresh]
+        if new_misses:
+            self.pool.start(ThumbPrefetchWorker(self.disk_cache, new_misses, size), 1)
+        if misses:
+            self.thumbs.submit(owner, [(p, size) for p in misses], replace=False)
+
+    def prioritize_thumbs(self, owner: str, visible: list[str], prefetch: list[str]) -> None:
+        view = self._views.get(owner)
+        if view is None:
+            return
+        size = view[0]
+        self.warmup.touch()  # scrolling
+        self.thumbs.prioritize(owner, [(p, size) for p in visible], [(p, size) for p in prefetch])
 
-        self.pool.start(ThumbWorker(path, self.thumb_size, _emit))
+    def cancel_thumbs(self, owner: str) -> None:
+        """
+        Unsubscribe a view (tab closed, results cleared) and drop its queued work.
+        """
+        self._unsubscribe(owner)
+        self.thumbs.cancel(owner)
+
+    def _subscribe(self, owner: str, paths: list[str]) -> None:
+        self._shown.setdefault(owner, set()).update(paths)
+        for p in paths:
+            self._viewers_of.setdefault(p, set()).add(owner)
+
+    def _unsubscribe(self, owner: str) -> None:
+        self._views.pop(owner, None)
+        for p in self._shown.pop(owner, ()):
+            owners = self._viewers_of.get(p)
+            if owners is not None:
+                owners.discard(owner)
+                if not owners:
+                    del self._viewers_of[p]
+
+    def _split_cached(self, paths: list[str], size: int) -> tuple[dict[str, QPixmap], list[str]]:
+        """
+        :return: ({path: pixmap} memory-cache hits, misses in order)
+        """
+        hits, misses = {}, []
+        for p in paths:
+            cached = self.cache.get(p, size)
+            if cached is None:
+                misses.append(p)
+            else:
+                hits[p] = cached
+        return hits, misses
+
+    def _start_thumb(self, job: tuple[str, int]) -> None:
+        path, size = job
+        self.warmup.touch()  # foreground decodes keep the warm-up paused
+        probe = None
+        if Path(path).suffix.lower() in VIDEO_SUFFIXES:
+            cached = self.dao.video_probe(path)
+            probe = VideoProbe(*cached) if cached else None
+
+        # the worker checks the disk cache before decoding, stat + small read instead of a full decode
+        self.pool.start(ThumbWorker(path, size, self.delivery, self.disk_cache, probe))
+
+    def _on_thumbs_delivered(self, batch: list[tuple[ThumbResult, QPixmap | None]]) -> None:
+        routed: dict[str, dict[str, QPixmap]] = {}  # owner -> its share of the batch
+        for r, pix in batch:
+            self.thumbs.done((r.path, r.size))
+            if r.phash is not None:
+                self.similarity.record(r.path, r.phash)
+            if r.probe is not None:
+                self.dao.set_video_probe(r.path, *r.probe)
+            if pix is None:
+                continue  # unreadable, a later request may retry
+            self.cache.set(r.path, r.size, pix)
+            for owner in self._viewers_of.get(r.path, ()):
+                if self._views[owner][0] == r.size:
+                    routed.setdefault(owner, {})[r.path] = pix
+        for owner, pixmaps in routed.items():
+            view = self._views.get(owner)
+            if view is not None:  # an earlier callback may have unsubscribed it
+                view[1](pixmaps)
+
+    def fit_thumb_cache(self, view_key: str, tiles: int, size: int | None = None) -> None:
+        """
+        Size the memory cache for the views' current presets: at least THUMB_CACHE_SCREENS screenfuls
+        of the most demanding view, never below the RAM based default, never above 1/4 of RAM.
+        :param view_key: Stable id of the calling view
+        :param tiles: Thumbnails one screen of that view shows (view_utils.tiles_per_view)
+        :param size: Thumbnail level the view shows, thumb_size if omitted
+        """
+        size = size or self.thumb_size
+        self._view_bytes[view_key] = tiles * size * size * 4  # pixel bytes of one screenful
+        needed = THUMB_CACHE_SCREENS * max(self._view_bytes.values())
+        self.cache.set_budget(min(physical_ram() // 4, max(default_budget(), needed)))
+
+    def thumb_cache_stats(self) -> dict[str, int]:
+        return {**self.cache.stats(), **self.thumbs.stats()}
+
+    def _log_thumb_stats(self) -> None:
+        stats = self.thumb_cache_stats()
+        seen = stats["hits"] + stats["misses"]
+        if seen == self._stats_seen:
+            return  # nothing requested since the last line
+        self._stats_seen = seen
+        looked_up = max(1, seen)
+        logger.debug(
+            f"Thumbnail cache: {stats['hits'] / looked_up:.0%} hits of {seen:,}, "
+            f"{stats['resident_bytes'] / 2**20:.0f}/{stats['budget_bytes'] / 2**20:.0f} MiB in "
+            f"{stats['entries']:,} entries, {stats['evictions']:,} evicted; scheduler {stats['queued']} queued, "
+            f"{stats['running']} running, {stats['started']:,} started, {stats['coalesced']:,} coalesced, "
+            f"{stats['cancelled']:,} cancelled"
+        )
 
     # ----------------------------- Bookmarks -----------------------------
 
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from PySide6.QtCore import QStandardPaths, QByteArray, QBuffer, QIODevice, QThreadPool
+from PySide6.QtGui import QImage
+
+from .thumb_pack import ThumbPack
+
+logger = logging.getLogger(__name__)
+
+# total size of encoded thumbnails kept on disk before the least recently used are dropped
+DISK_CACHE_BYTES = 1024 * 1024 * 1024
+_JPEG_QUALITY = 85
+# compaction runs as its own pool job, behind thumbnail and warm-up work
+GC_PRIORITY = -4
+
+
+def default_cache_dir() -> Path:
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return Path(base or Path.home() / ".cache") / "oculus" / "thumbs"
+
+
+class ThumbKey(NamedTuple):
+    digest: bytes
+    path: str
+    size: int
+
+
+def _digest(path: str, st: os.stat_result, size: int) -> bytes:
+    return hashlib.blake2b(
+        f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0{size}".encode("utf-8", "surrogateescape"),
+        digest_size=16,
+    ).digest()
+
+
+class DiskThumbCache:
+    """
+    Second-level, persistent thumbnail cache backed by a ThumbPack. Entries are content addressed by
+    (path, mtime_ns, byte_size, thumb size): an edited file hashes to a new key, and its stale
+    entry is dropped by the next compaction. Safe to use from worker threads.
+    """
+
+    def __init__(self, root: str | Path | None = None, max_bytes: int = DISK_CACHE_BYTES):
+        self.root = Path(root) if root else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.pack = ThumbPack(self.root, max_bytes)
+        self._gc_lock = threading.Lock()
+        self._gc_queued = False
+
+    # ------------------------------------------------------
+    def entry(self, path: str, size: int) -> ThumbKey | None:
+        """
+        Cache key for the current state of path at the given thumb size, None if path is gone.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return ThumbKey(_digest(path, st, size), path, size)
+
+    def load(self, entry: ThumbKey) -> QImage | None:
+        data = self.pack.get(entry.digest)
+        if data is None:
+            return None
+        img = QImage.fromData(data)
+        return None if img.isNull() else img
+
+    def store(self, entry: ThumbKey, img: QImage) -> None:
+        fmt, quality = ("PNG", -1) if img.hasAlphaChannel() else ("JPG", _JPEG_QUALITY)
+        buf = QByteArray()
+        dev = QBuffer(buf)
+        dev.open(QIODevice.WriteOnly)
+        if not img.save(dev, fmt, quality):
+            return
+        try:
+            self.pack.put(entry.digest, entry.path, entry.size, bytes(buf.data()), img.width(), img.height())
+        except OSError as e:
+            logger.debug(f"Disk thumbnail write failed for {entry.path}: {e}")
+            return
+        if self.pack.pack_bytes() > self.max_bytes and not self._gc_queued:
+            # never inline: this is a thumbnail worker, the views are waiting on it
+            self._gc_queued = True
+            QThreadPool.globalInstance().start(self.gc, GC_PRIORITY)
+
+    def prefetch(self, paths: list[str], size: int) -> int:
+        """
+        Pull the cached thumbnails of paths into the page cache in as few sequential reads as possible.
+        :return: Number of paths with a cached thumbnail
+        """
+        keys = [e.digest for p in paths if (e := self.entry(p, size)) is not None]
+        return self.pack.prefetch(keys)
+
+    def gc(self) -> int:
+        """
+        Compact the pack: drop entries whose file changed or vanished, then the least recently
+        used until the cache is back under its cap. Writers keep appending meanwhile.
+        :return: Number of entries dropped
+        """
+        if not self._gc_lock.acquire(blocking=False):
+            return 0  # another thread is already compacting
+        try:
+            return self.pack.compact(self._is_live)
+        except OSError as e:
+            logger.warning(f"Disk thumbnail compaction failed: {e}")
+            return 0
+        finally:
+            self._gc_queued = False
+            self._gc_lock.release()
+
+    # ------------------------------------------------------
+    @staticmethod
+    def _is_live(digest: bytes, path: str, size: int) -> bool:
+        try:
+            return _digest(path, os.stat(path), size) == digest
+        except OSError:
+            return False
@@ -1,30 +1,107 @@
+from __future__ import annotations
+
+import logging
+import os
 from collections import OrderedDict
+
 from PySide6.QtGui import QPixmap
 
+logger = logging.getLogger(__name__)
+
+_MIB = 1024 * 1024
+# default share of physical RAM the thumbnail cache may use, and its hard bounds
+RAM_FRACTION = 16
+MIN_BUDGET = 64 * _MIB
+MAX_BUDGET = 8 * 1024 * _MIB
+# assumed when the platform does not report physical memory
+_FALLBACK_RAM = 8 * 1024 * _MIB
+
+
+def physical_ram() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:  # Windows
+        import ctypes
+
+        class _MemStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = _MemStatus()
+        status.dwLength = ctypes.sizeof(_MemStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return int(status.ullTotalPhys)
+    except (AttributeError, OSError):
+        pass
+    return _FALLBACK_RAM
+
+
+def default_budget() -> int:
+    """
+    1/RAM_FRACTION of physical memory, clamped: 512 MiB on an 8 GB machine, 4 GiB on 64 GB.
+    """
+    return max(MIN_BUDGET, min(MAX_BUDGET, physical_ram() // RAM_FRACTION))
+
+
+def pixmap_bytes(pix: QPixmap) -> int:
+    return pix.width() * pix.height() * max(1, pix.depth() // 8)
+
+
 class ThumbCache:
     """
-    In-memory LRU cache keyed by (path, size).
+    In-memory LRU cache keyed by (path, size), bounded by the pixel memory of its pixmaps.
     """
-    def __init__(self, capacity: int = 512):
-        self.capacity = capacity
-        self._cache: OrderedDict[tuple[str, int], QPixmap] = OrderedDict()
+    def __init__(self, budget_bytes: int | None = None):
+        self.budget = budget_bytes or default_budget()
+        self._cache: OrderedDict[tuple[str, int], tuple[QPixmap, int]] = OrderedDict()
+        self.resident = 0
+        self.hits = self.misses = self.evictions = 0
 
     # ------------------------------------------------------
     def get(self, path: str, size: int) -> QPixmap | None:
         key = (path, size)
-        pix = self._cache.get(key)
-        if pix is not None:
-            self._cache.move_to_end(key)  # mark as recently used
-        return pix
+        item = self._cache.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)  # mark as recently used
+        return item[0]
 
     def set(self, path: str, size: int, pix: QPixmap):
         key = (path, size)
-        self._cache[key] = pix
-        self._cache.move_to_end(key)
-        if len(self._cache) > self.capacity:
-            self._cache.popitem(last=False)  # evict oldest
-
-    def replace_capacity(self, capacity: int):
-        self.capacity = capacity
-        while len(self._cache) > self.capacity:
-            self._cache.popitem(last=False)
+        cost = pixmap_bytes(pix)
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self.resident -= old[1]
+        self._cache[key] = (pix, cost)
+        self.resident += cost
+        self._evict()
+
+    def set_budget(self, budget_bytes: int):
+        if budget_bytes != self.budget:
+            logger.info(f"Thumbnail cache budget {self.budget / _MIB:.0f} -> {budget_bytes / _MIB:.0f} MiB")
+        self.budget = budget_bytes
+        self._evict()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._cache),
+            "resident_bytes": self.resident,
+            "budget_bytes": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self):
+        # always keep the newest entry, even if it alone exceeds the budget
+        while self.resident > self.budget and len(self._cache) > 1:
+            _, (_, cost) = self._cache.popitem(last=False)  # evict oldest
+            self.resident -= cost
+            self.evictions += 1
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+_INDEX_NAME = "index.db"
+_SQL_CHUNK = 900
+# keys whose last-use time is only written back once this many hits piled up
+_TOUCH_FLUSH = 256
+# neighbouring entries closer than this are prefetched as one sequential run
+_PREFETCH_GAP = 1024 * 1024
+# compaction keeps this fraction of the cap so it does not run again right away
+_COMPACT_TARGET = 0.8
+
+
+def _pack_name(gen: int) -> str:
+    return f"thumbs-{gen}.pack"
+
+
+class ThumbPack:
+    """
+    Append-only pack of encoded thumbnails plus a SQLite index (key -> generation, offset, length, w, h).
+
+    Reads look the key up through a per-thread index connection (itself memory mapped) and slice
+    the pack's mmap, so a hit costs no file open and no read syscall. Writers append under one lock.
+    compact() rewrites live entries into a new generation, most recently used first and grouped by
+    path so a folder's thumbnails sit next to each other on disk.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()  # appends and the generation swap
+        self._compacting = threading.Lock()
+        self._local = threading.local()
+        self._touched: dict[bytes, int] = {}
+        self._maps: dict[int, mmap.mmap] = {}
+
+        self._writer = self._connect()
+        self._writer.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key     BLOB PRIMARY KEY,
+                path    TEXT NOT NULL,
+                thumb   INTEGER NOT NULL,
+                gen     INTEGER NOT NULL,
+                offset  INTEGER NOT NULL,
+                length  INTEGER NOT NULL,
+                width   INTEGER,
+                height  INTEGER,
+                used    INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_path ON entries(path);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta(name, value) VALUES ('gen', 0);
+            """
+        )
+        self._writer.commit()
+        self._gen = self._writer.execute("SELECT value FROM meta WHERE name='gen'").fetchone()[0]
+        self._data = open(self.root / _pack_name(self._gen), "ab")
+        self._drop_other_packs()
+
+    # ------------------------------------------------------
+    def get(self, key: bytes) -> bytes | None:
+        row = self._reader().execute("SELECT gen, offset, length FROM entries WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        data = self._slice(*row)
+        if data is not None:
+            self._touched[key] = int(time.time())
+        return data
+
+    def put(self, key: bytes, path: str, thumb: int, data: bytes, width: int, height: int) -> None:
+        with self._lock:
+            offset = self._data.seek(0, os.SEEK_END)
+            self._data.write(data)
+            self._data.flush()  # visible to the next mmap
+            with self._writer:
+                self._writer.execute(
+                    "INSERT OR REPLACE INTO entries(key, path, thumb, gen, offset, length, width, height, used) "
+                    "VALUES (?,?,?,?,?,?,?,?,?)",
+                    (key, path, thumb, self._gen, offset, len(data), width, height, int(time.time())),
+                )
+                if len(self._touched) >= _TOUCH_FLUSH:
+                    self._flush_touched()
+
+    def pack_bytes(self) -> int:
+        with self._lock:
+            return self._data.seek(0, os.SEEK_END)
+
+    def prefetch(self, keys: Iterable[bytes]) -> int:
+        """
+        Pull the given entries into the page cache with as few sequential reads as possible.
+        :return: Number of entries found
+        """
+        spans = []
+        keys = list(keys)
+        db = self._reader()
+        for i in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[i: i + _SQL_CHUNK]
+            q = ",".join("?" * len(chunk))
+            spans.extend(db.execute(
+                f"SELECT offset, length FROM entries WHERE gen=? AND key IN ({q})", (self._gen, *chunk)
+            ).fetchall())
+        if not spans:
+            return 0
+
+        spans.sort()
+        runs = [[spans[0][0], spans[0][0] + spans[0][1]]]
+        for off, length in spans[1:]:
+            if off - runs[-1][1] <= _PREFETCH_GAP:
+                runs[-1][1] = max(runs[-1][1], off + length)
+            else:
+                runs.append([off, off + length])
+
+        m = self._map(self._gen, runs[-1][1])
+        if m is None:
+            return 0
+        for lo, hi in runs:
+            lo -= lo % mmap.PAGESIZE
+            if hasattr(m, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+                m.madvise(mmap.MADV_WILLNEED, lo, min(hi, len(m)) - lo)
+            else:
+                for pos in range(lo, hi, _PREFETCH_GAP):  # plain sequential read through the run
+                    m[pos:min(hi, pos + _PREFETCH_GAP)]
+        return len(spans)
+
+    def compact(self, is_live: Callable[[bytes, str, int], bool]) -> int:
+        """
+        Rewrite live entries into a new pack generation, dropping dead and least recently used ones.
+        The liveness stats and the copy run on a snapshot without the writer lock, put() keeps going
+        meanwhile: entries appended since are carried over when the lock is taken for the swap.
+        :param is_live: (key, path, thumb) -> False once the source file changed or vanished
+        :return: Number of entries dropped
+        """
+        with self._compacting:
+            return self._compact(is_live)
+
+    def _compact(self, is_live: Callable[[bytes, str, int], bool]) -> int:
+        with self._lock:
+            with self._writer:
+                self._flush_touched()
+            rows = self._writer.execute(
+                "SELECT key, path, thumb, gen, offset, length, width, height, used FROM entries "
+                "ORDER BY used DESC"
+            ).fetchall()
+            old_gen = self._gen
+            snapshot_end = self._data.seek(0, os.SEEK_END)
+
+        kept, total = [], 0
+        budget = self.max_bytes * _COMPACT_TARGET
+        for row in rows:
+            if total + row[5] > budget or not is_live(row[0], row[1], row[2]):
+                continue
+            kept.append(row)
+            total += row[5]
+        kept.sort(key=lambda r: (r[1], r[2]))  # folder order, enables one-pass prefetch
+
+        new_gen = old_gen + 1
+        new_rows = {}
+        with open(self.root / _pack_name(new_gen), "wb") as out:
+            self._copy_rows(kept, new_gen, out, new_rows)
+
+            with self._lock:
+                # written while the snapshot was copied, a re-put key replaces its snapshot row
+                fresh = self._writer.execute(
+                    "SELECT key, path, thumb, gen, offset, length, width, height, used FROM entries "
+                    "WHERE gen = ? AND offset >= ?", (old_gen, snapshot_end)
+                ).fetchall()
+                self._copy_rows(fresh, new_gen, out, new_rows)
+                out.flush()
+
+                with self._writer:
+                    self._writer.execute("DELETE FROM entries")
+                    self._writer.executemany("INSERT INTO entries VALUES (?,?,?,?,?,?,?,?,?)", new_rows.values())
+                    self._writer.execute("UPDATE meta SET value=? WHERE name='gen'", (new_gen,))
+
+                self._data.close()
+                self._data = open(self.root / _pack_name(new_gen), "ab")
+                self._gen = new_gen
+                self._maps = {}
+                self._drop_other_packs()
+
+        dropped = len(rows) + len(fresh) - len(new_rows)
+        logger.info(f"Thumbnail pack compacted: {len(new_rows)} kept, {dropped} dropped, {total / 2**20:.0f} MiB")
+        return dropped
+
+    def _copy_rows(self, rows, gen: int, out, into: dict) -> None:
+        for key, path, thumb, old_gen, offset, length, w, h, used in rows:
+            data = self._slice(old_gen, offset, length)
+            if data is None:
+                continue
+            into[key] = (key, path, thumb, gen, out.tell(), length, w, h, used)
+            out.write(data)
+
+    # ------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.root / _INDEX_NAME, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size=268435456")  # index lookups without read syscalls
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _map(self, gen: int, needed: int) -> mmap.mmap | None:
+        m = self._maps.get(gen)
+        if m is not None and len(m) >= needed:
+            return m
+        if gen != self._gen:
+            return None  # compacted away since the index row was read
+        try:
+            with open(self.root / _pack_name(gen), "rb") as fp:
+                size = os.fstat(fp.fileno()).st_size
+                if size < needed:
+                    return None
+                m = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        # the old, shorter map is simply dropped: slices already taken are copies
+        self._maps[gen] = m
+        return m
+
+    def _slice(self, gen: int, offset: int, length: int) -> bytes | None:
+        m = self._map(gen, offset + length)
+        return None if m is None else m[offset:offset + length]
+
+    def _flush_touched(self) -> None:
+        touched, self._touched = self._touched, {}
+        self._writer.executemany("UPDATE entries SET used=? WHERE key=?", [(t, k) for k, t in touched.items()])
+
+    def _drop_other_packs(self) -> None:
+        current = _pack_name(self._gen)
+        for f in self.root.glob("thumbs-*.pack"):
+            if f.name != current:
+                try:
+                    f.unlink()
+                except OSError:
+                    pass  # still mapped elsewhere (Windows), retried on the next start
@@ -0,0 +1,226 @@
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QIcon
+
+from models.thumbnail_model import IS_DIR_ROLE, STACK_ROLE, _ranges
+
+# rows exposed per fetchMore, the view only lays out what has been fetched
+FETCH_ROWS = 5000
+# rows looked up with one query around a cache miss, biased towards scrolling down
+RESOLVE_ROWS = 256
+# resolved rows (path, name, icon) kept, a few screenfuls at the largest preset
+CACHE_ROWS = 8192
+
+# media ids -> {id: (path, is_dir, stacked)}, ids missing from the DB are left out
+Resolver = Callable[[List[int]], Dict[int, Tuple[str, bool, bool]]]
+
+
+class _Row:
+    __slots__ = ("path", "name", "is_dir", "stacked", "icon")
+
+    def __init__(self, path: str, is_dir: bool, stacked: bool) -> None:
+        self.path = path
+        self.name = Path(path).name
+        self.is_dir = is_dir
+        self.stacked = stacked
+        self.icon: QIcon | None = None
+
+
+class IdPathList(Sequence):
+    """
+    Read-only list of paths over an id array, for handing a result set to the viewer: paths are
+    resolved RESOLVE_ROWS at a time around the index asked for, not all up front.
+
+    index() / `in` go through path_to_id, so a lookup costs one query instead of resolving the list.
+    Ids missing from the DB resolve to "" (the viewer skips a path with no media id).
+    """
+
+    def __init__(self, ids: array, resolve: Resolver, path_to_id: Callable[[str], Optional[int]]) -> None:
+        self._ids = ids
+        self._resolve = resolve
+        self._path_to_id = path_to_id
+        self._cache: "OrderedDict[int, str]" = OrderedDict()  # position -> path
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return IdPathList(self._ids[i], self._resolve, self._path_to_id)
+        if i < 0:
+            i += len(self._ids)
+        if not 0 <= i < len(self._ids):
+            raise IndexError(i)
+        if i not in self._cache:
+            first = max(0, i - RESOLVE_ROWS // 2)
+            block = range(first, min(first + RESOLVE_ROWS, len(self._ids)))
+            found = self._resolve([self._ids[r] for r in block])
+            for r in block:
+                hit = found.get(self._ids[r])
+                self._cache[r] = hit[0] if hit is not None else ""
+            while len(self._cache) > CACHE_ROWS:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(i)
+        return self._cache[i]
+
+    def index(self, path: str, start: int = 0, stop: int | None = None) -> int:
+        mid = self._path_to_id(path)
+        if mid is None:
+            raise ValueError(f"{path} is not in list")
+        try:
+            return self._ids.index(mid, start, len(self._ids) if stop is None else stop)
+        except ValueError:
+            raise ValueError(f"{path} is not in list") from None
+
+    def __contains__(self, path) -> bool:
+        try:
+            self.index(path)
+        except ValueError:
+            return False
+        return True
+
+
+class MediaIdListModel(QAbstractListModel):
+    """
+    List model over media ids for result sets too large to hold as path strings (a library-wide search).
+
+    Rows are a compact array('q') of ids. Path, display name, stack flag and icon are resolved on first
+    paint, a block of rows per query, and kept in a small LRU keyed by row. Path lookups (row_of, set_icons)
+    only see resolved rows: thumbnails for rows that scrolled out of the cache are simply re-requested.
+    Rows reach the view in FETCH_ROWS blocks through canFetchMore / fetchMore.
+    """
+
+    def __init__(self, resolve: Resolver, parent=None) -> None:
+        super().__init__(parent)
+        self._resolve = resolve
+        self._ids = array("q")
+        self._loaded = 0
+        self._cache: "OrderedDict[int, _Row | None]" = OrderedDict()  # row -> resolved row, None if gone
+        self._rows: Dict[str, int] = {}  # path -> row, resolved rows only
+        self.folder_icon: QIcon | None = None
+
+    def set_ids(self, ids: array) -> None:
+        """Reset list with a new ordered array of media ids."""
+        self.beginResetModel()
+        self._ids = ids
+        self._loaded = min(len(ids), FETCH_ROWS)
+        self._cache.clear()
+        self._rows.clear()
+        self.endResetModel()
+
+    # noqa: N802 (Qt naming)
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._loaded < len(self._ids)
+
+    # noqa: N802 (Qt naming)
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        n = min(FETCH_ROWS, len(self._ids) - self._loaded)
+        if parent.isValid() or n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    # ------------------------------------------------------
+    def _entry(self, row: int) -> "_Row | None":
+        if row in self._cache:
+            self._cache.move_to_end(row)
+            return self._cache[row]
+        self._fill(row - RESOLVE_ROWS // 4, row + RESOLVE_ROWS * 3 // 4)
+        return self._cache.get(row)
+
+    def _fill(self, first: int, last: int) -> None:
+        """
+        Resolve the uncached rows in [first, last] with one lookup, evicting the least recently used.
+        """
+        first, last = max(0, first), min(last, len(self._ids) - 1)
+        missing = [r for r in range(first, last + 1) if r not in self._cache]
+        if not missing:
+            return
+        found = self._resolve([self._ids[r] for r in missing])
+        for r in missing:
+            hit = found.get(self._ids[r])
+            entry = _Row(*hit) if hit is not None else None
+            self._cache[r] = entry
+            if entry is not None:
+                self._rows[entry.path] = r
+        while len(self._cache) > max(CACHE_ROWS, len(missing)):
+            _, old = self._cache.popitem(last=False)
+            if old is not None:
+                self._rows.pop(old.path, None)
+
+    def paths_in(self, first: int, last: int, *, files_only: bool = False, no_icon: bool = False) -> List[str]:
+        """
+        Paths of the fetched rows first..last in row order, resolving them as one block.
+        no_icon keeps only rows without a thumbnail yet (new, or evicted from the cache and re-resolved).
+        """
+        last = min(last, self._loaded - 1)
+        self._fill(first, last)
+        out = []
+        for r in range(max(0, first), last + 1):
+            entry = self._cache.get(r)
+            if entry is not None and not (files_only and entry.is_dir) and not (no_icon and entry.icon is not None):
+                out.append(entry.path)
+        return out
+
+    def row_of(self, path: str) -> int | None:
+        return self._rows.get(path)
+
+    def set_icons(self, icons: Dict[str, QIcon]) -> None:
+        """
+        Set thumbnails of resolved rows, one dataChanged per contiguous row range. Other paths are ignored.
+        """
+        rows = []
+        for path, icon in icons.items():
+            row = self._rows.get(path)
+            if row is not None:
+                self._cache[row].icon = icon
+                rows.append(row)
+        for first, last in _ranges(sorted(rows)):
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.DecorationRole])
+
+    # noqa: N802 (Qt naming)
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    # noqa: N802 (Qt naming)
+    def data(self, index: QModelIndex, role: int):
+        if not index.isValid():
+            return None
+
+        entry = self._entry(index.row())
+        if entry is None:
+            return None  # removed from the library since the search ran
+
+        if role == Qt.DisplayRole:
+            return entry.name
+
+        if role == Qt.DecorationRole:
+            return self.folder_icon if entry.is_dir and entry.icon is None else entry.icon
+
+        if role == Qt.UserRole:
+            return entry.path
+
+        if role == STACK_ROLE:
+            return entry.stacked
+
+        if role == IS_DIR_ROLE:
+            return entry.is_dir
+
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:  # noqa: N802
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def nav_paths(self, keep: Callable[[array], array],
+                  path_to_id: Callable[[str], Optional[int]]) -> IdPathList:
+        """
+        Lazily resolved paths of the result set rows kept by keep (ids -> filtered ids, in order).
+        """
+        return IdPathList(keep(self._ids), self._resolve, path_to_id)
@@ -1,24 +1,66 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Set
 
 from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
 from PySide6.QtGui import QIcon
 
+# bool: row is the base of a variant stack, drawn as a badge by ThumbnailDelegate
+STACK_ROLE = Qt.UserRole + 1
+# bool: row is a folder, lets controllers branch without a stat
+IS_DIR_ROLE = Qt.UserRole + 2
+
+
+def _ranges(rows: List[int]) -> List[tuple[int, int]]:
+    """
+    Sorted rows -> [(first, last)] contiguous ranges.
+    """
+    out = []
+    for row in rows:
+        if out and row == out[-1][1] + 1:
+            out[-1] = (out[-1][0], row)
+        else:
+            out.append((row, row))
+    return out
+
 
 class ThumbnailListModel(QAbstractListModel):
 
     def __init__(self, paths: List[str] | None = None, parent=None) -> None:
         super().__init__(parent)
         self._paths: List[str] = paths or []
+        self._rows: Dict[str, int] = {p: i for i, p in enumerate(self._paths)}  # path -> row
         self._icons: Dict[str, QIcon] = {}
+        self._stacked: Set[str] = set()
+        self._dirs: Set[str] = set()
+        self.folder_icon: QIcon | None = None  # shown for folder rows without an icon of their own
 
-    def set_paths(self, paths: List[str]) -> None:
-        """Reset list with a new ordered set of absolute paths."""
+    def set_paths(self, paths: List[str], dirs: Set[str] = frozenset()) -> None:
+        """
+        Reset list with a new ordered set of absolute paths.
+        :param dirs: Which of paths are folders, as known by the caller's listing
+        """
         self.beginResetModel()
         self._paths = paths
+        self._rows = {p: i for i, p in enumerate(paths)}
         self._icons.clear()
+        self._stacked.clear()
+        self._dirs = {p for p in dirs if p in self._rows}
         self.endResetModel()
 
+    def row_of(self, path: str) -> int | None:
+        return self._rows.get(path)
+
+    def is_dir(self, path: str) -> bool:
+        return path in self._dirs
+
+    def set_stacked(self, paths: Set[str]) -> None:
+        """
+        Replace the set of stack-base paths, repainting only rows whose badge changed.
+        """
+        changed = self._stacked ^ paths
+        self._stacked = set(paths)
+        self._emit_rows([self._rows[p] for p in changed if p in self._rows], [STACK_ROLE])
+
     def add_path(self, path: str) -> int:
         """
         Append a new absolute path to the model and return its row index.
@@ -26,14 +68,69 @@ class ThumbnailListModel(QAbstractListModel):
         :param path:
         :return:
         """
-        if path in self._paths:
-            return self._paths.index(path)
-
-        row = len(self._paths)
-        self.beginInsertRows(QModelIndex(), row, row)
-        self._paths.append(path)
+        row = self._rows.get(path)
+        if row is not None:
+            return row
+        self.insert_paths([path])
+        return self._rows[path]
+
+    def insert_paths(self, paths: List[str], row: int | None = None,
+                     dirs: Set[str] = frozenset(), stacked: Set[str] = frozenset()) -> int:
+        """
+        Insert paths as one block at row (appended by default). Paths already in the model are skipped.
+        :param dirs: Which of paths are folders
+        :param stacked: Which of paths are stack bases
+        :return: Number of rows inserted
+        """
+        fresh = list(dict.fromkeys(p for p in paths if p not in self._rows))
+        if not fresh:
+            return 0
+        row = len(self._paths) if row is None else max(0, min(row, len(self._paths)))
+        self.beginInsertRows(QModelIndex(), row, row + len(fresh) - 1)
+        self._paths[row:row] = fresh
+        self._dirs.update(p for p in fresh if p in dirs)
+        self._stacked.update(p for p in fresh if p in stacked)
+        self._reindex(row)
         self.endInsertRows()
-        return row
+        return len(fresh)
+
+    def reorder(self, paths: List[str]) -> None:
+        """
+        Show the same paths in a new order (re-sort) with one layout change: icons, flags and
+        persistent indexes (selection, current item) follow their rows.
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        moved = [self._paths[i.row()] for i in persistent]
+        self._paths = list(paths)
+        self._reindex(0)
+        self.changePersistentIndexList(persistent, [self.index(self._rows[p]) for p in moved])
+        self.layoutChanged.emit()
+
+    def remove_paths(self, paths: List[str]) -> int:
+        """
+        Drop the rows showing paths, one beginRemoveRows per contiguous range. Unknown paths are ignored.
+        :return: Number of rows removed
+        """
+        rows = sorted({self._rows[p] for p in paths if p in self._rows})
+        if not rows:
+            return 0
+        # back to front, so the rows of ranges still to remove do not shift
+        for first, last in reversed(_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for p in self._paths[first:last + 1]:
+                del self._rows[p]
+                self._icons.pop(p, None)
+                self._stacked.discard(p)
+                self._dirs.discard(p)
+            del self._paths[first:last + 1]
+            self.endRemoveRows()
+        self._reindex(rows[0])
+        return len(rows)
+
+    def _reindex(self, start: int) -> None:
+        for i in range(start, len(self._paths)):
+            self._rows[self._paths[i]] = i
 
     def update_icon(self, path: str, icon: QIcon) -> None:
         """
@@ -41,14 +138,30 @@ class ThumbnailListModel(QAbstractListModel):
         Emits dataChanged so the view repaints only that row.
         """
         if path not in self._icons:
-            try:
-                row = self._paths.index(path)
-            except ValueError:
+            row = self._rows.get(path)
+            if row is None:
                 return  # path not in current view
             self._icons[path] = icon
             idx = self.index(row)
             self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
 
+    def set_icons(self, icons: Dict[str, QIcon]) -> None:
+        """
+        Set (or replace) many thumbnails at once, one dataChanged per contiguous row range.
+        Paths not in the model are ignored.
+        """
+        rows = []
+        for path, icon in icons.items():
+            row = self._rows.get(path)
+            if row is not None:
+                self._icons[path] = icon
+                rows.append(row)
+        self._emit_rows(rows, [Qt.DecorationRole])
+
+    def _emit_rows(self, rows: List[int], roles: list) -> None:
+        for first, last in _ranges(sorted(rows)):
+            self.dataChanged.emit(self.index(first), self.index(last), roles)
+
     def update_display(self, old_path: str, new_name: str, *, new_user_role: str):
         """
         Change the display label (and role data) for one row.
@@ -57,11 +170,17 @@ class ThumbnailListModel(QAbstractListModel):
         :param new_user_role:
         :return:
         """
-        try:
-            idx = self._paths.index(old_path)
-        except ValueError:
+        idx = self._rows.pop(old_path, None)
+        if idx is None:
             return
         self._paths[idx] = new_user_role  # replace stored path
+        self._rows[new_user_role] = idx
+        if old_path in self._stacked:
+            self._stacked.discard(old_path)
+            self._stacked.add(new_user_role)
+        if old_path in self._dirs:
+            self._dirs.discard(old_path)
+            self._dirs.add(new_user_role)
         model_idx = self.index(idx)
         self.dataChanged.emit(model_idx, model_idx, [Qt.DisplayRole, Qt.UserRole])
 
@@ -84,11 +203,18 @@ class ThumbnailListModel(QAbstractListModel):
             return Path(path).name
 
         if role == Qt.DecorationRole:
-            return self._icons.get(path)
+            icon = self._icons.get(path)
+            return self.folder_icon if icon is None and path in self._dirs else icon
 
         if role == Qt.UserRole:
             return path
 
+        if role == STACK_ROLE:
+            return path in self._stacked
+
+        if role == IS_DIR_ROLE:
+            return path in self._dirs
+
         return None
 
     def flags(self, index: QModelIndex) -> Qt.ItemFlags:  # noqa: N802
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject
+
+from managers.dao import MediaDAO
+from services.watch_service import WatchService
+from workers.scan_worker import IMAGE_EXT
+
+logger = logging.getLogger(__name__)
+
+
+class FolderEntry(NamedTuple):
+    """
+    One row of a folder listing. type / mtime are None for folders read straight from disk.
+    """
+    path: str
+    is_dir: bool
+    type: str | None
+    byte_size: int
+    mtime: int | None
+
+
+class FolderListingService(QObject):
+    """
+    Serves folder contents from the media table (one lookup on the media.parent index) instead of
+    listing and stat-ing the folder on every navigation, which is slow on network mounts.
+
+    A folder served from the DB is then reconciled with disk in the background by the watcher's
+    DirSyncWorker: one stat when nothing changed, otherwise the difference reaches the views through
+    media_changed like any other sync. Folders the library never listed are read from disk, one scandir pass.
+    """
+
+    def __init__(self, dao: MediaDAO, watcher: WatchService, parent=None):
+        super().__init__(parent)
+        self.dao = dao
+        self.watcher = watcher
+
+    def list_folder(self, folder: str) -> list[FolderEntry] | None:
+        """
+        Sub-folders and media files directly inside folder, in no particular order.
+        :param folder: Absolute folder path
+        :return: None if folder is not a readable directory
+        """
+        rows = self.dao.folder_listing(folder)
+        if rows is None:
+            return self._from_disk(folder)
+        self.watcher.refresh([folder])
+        return [FolderEntry(*r) for r in rows]
+
+    @staticmethod
+    def _from_disk(folder: str) -> list[FolderEntry] | None:
+        """
+        Uses the directory entry types, so no stat per entry where the OS reports them (most local FS, SMB).
+        """
+        entries = []
+        try:
+            with os.scandir(folder) as it:
+                for de in it:
+                    try:
+                        if de.is_dir():
+                            entries.append(FolderEntry(de.path, True, None, 0, None))
+                        elif os.path.splitext(de.name)[1].lower() in IMAGE_EXT and de.is_file():
+                            entries.append(FolderEntry(de.path, False, None, 0, None))
+                    except OSError:
+                        continue  # vanished or unreadable entry
+        except OSError as e:
+            logger.warning(f"Could not list {folder}: {e}")
+            return None
+        return entries
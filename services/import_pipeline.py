@@ -0,0 +1,116 @@
+import os
+import time
+from pathlib import Path
+
+from managers.dao import MediaDAO
+from services.variant_service import VariantService
+from workers.scan_worker import ScanEntry, ScanBatch
+
+
+class ImportSummary:
+    def __init__(self, root, added, skipped, duration, tree=None, error=None):
+        self.root, self.added, self.skipped, self.duration = root, added, skipped, duration
+        # {folder: ([sub folders], [])} below root, FolderTreeWidget.load_tree format (folders only)
+        self.tree: dict[str, tuple[list[str], list[str]]] | None = tree
+        self.error: str | None = error  # set when the import stopped early, batches before it stay committed
+
+
+class ImportProgress:
+    def __init__(self, root, seen, added, skipped, rate, eta):
+        self.root, self.seen, self.added, self.skipped = root, seen, added, skipped
+        self.rate = rate  # files/s
+        self.eta = eta  # seconds, None while unknown
+
+
+class ImportPipeline:
+    """
+    Per-import state for the streaming stat -> inode diff -> insert -> variant stacking pipeline.
+    Each batch is committed on its own, so only the current batch is held in memory.
+    """
+
+    def __init__(self, dao: MediaDAO, variants: VariantService, root: Path, *, track_changes: bool = False):
+        self.dao = dao
+        self.variants = variants
+        self.root = root
+        self.seen = self.added = self.skipped = 0
+        # per-path change lists, only kept for small incremental syncs (e.g. the folder watcher)
+        self.added_paths: list[str] | None = [] if track_changes else None
+        self.moved: list[tuple[str, str]] | None = [] if track_changes else None
+        self._start = time.time()
+        self._dirs: dict[str, ScanEntry] = {}  # folder stat data seen so far
+        self._parents_done: set[str] = set()
+
+    def process(self, batch: ScanBatch) -> ImportProgress:
+        files = [e for e in batch.entries if not e.is_dir]
+        self._dirs.update((e.path, e) for e in batch.entries if e.is_dir)
+        new_entries: list[ScanEntry] = []
+        parents: set[str] = set()
+
+        inode_map = self.dao.fetch_many_inodes([e.inode for e in files])
+
+        with self.dao.transaction():  # one transaction per batch, the DAO helpers join it
+            for entry in files:
+                rec = inode_map.get(entry.inode)
+
+                # exact match -> skip
+                if rec and rec[1] == entry.path:
+                    self.skipped += 1
+                    continue
+
+                # inode known but path moved -> update (a live old path means the inode was reused)
+                if rec and not os.path.exists(rec[1]):
+                    self.dao.update_media_path(rec[0], entry.path, entry.mtime)
+                    self.skipped += 1
+                    if self.moved is not None:
+                        self.moved.append((rec[1], entry.path))
+                    continue
+
+                # brand-new file -> insert
+                new_entries.append(entry)
+                parents.add(os.path.dirname(entry.path))
+
+            ids = self.dao.insert_media_many(new_entries)
+            # queued in the same transaction, so an interrupted import still gets warmed
+            self.dao.queue_thumb_warm(ids[e.path] for e in new_entries)
+            self.added += len(new_entries)
+            if self.added_paths is not None:
+                self.added_paths.extend(e.path for e in new_entries)
+
+            # ensure all parent folders exist in DB
+            self.dao.insert_media_many(self._dir_entry(f) for f in parents - self._parents_done)
+            self._parents_done |= parents
+
+            # directory fingerprints commit together with the files they vouch for
+            self.dao.record_scanned_dirs(batch.dirs)
+
+        # stack only the new ones
+        self.variants.stack_batch([(ids[e.path], e.path) for e in new_entries])
+
+        self.seen += len(files)
+        return self._progress(batch)
+
+    def _dir_entry(self, folder: str) -> ScanEntry:
+        entry = self._dirs.get(folder)
+        if entry is None:  # folders above the first listing (e.g. the root) were never scanned as entries
+            st = os.stat(folder)
+            entry = ScanEntry(folder, st.st_ino, 0, int(st.st_mtime), True)
+        return entry
+
+    def finish(self) -> ImportSummary:
+        # Ensure import root itself is included
+        self.dao.insert_media(str(self.root), is_dir=True)
+        return ImportSummary(self.root, self.added, self.skipped, time.time() - self._start, self.folder_tree())
+
+    def folder_tree(self) -> dict[str, tuple[list[str], list[str]]]:
+        """
+        Folder hierarchy recorded in scan_dirs during this import, no extra filesystem traversal.
+        """
+        cache = self.dao.scan_dir_cache(str(self.root))
+        return {folder: (sorted(children), []) for folder, (_, children) in cache.items()}
+
+    def _progress(self, batch: ScanBatch) -> ImportProgress:
+        elapsed = time.time() - self._start
+        rate = self.seen / elapsed if elapsed else 0.0
+        # file count is unknown up front, so extrapolate from the share of directories still queued
+        eta = elapsed * batch.dirs_pending / batch.dirs_done if batch.dirs_done else None
+        return ImportProgress(self.root, self.seen, self.added, self.skipped, rate, eta)
@@ -1,25 +1,25 @@
-import os
+from collections import deque
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, QThreadPool
-from workers.scan_worker import ScanWorker, ScanResult
+from workers.import_worker import ImportWorker
 from managers.dao import MediaDAO
+from managers.db_utils import connection_path
+from services.import_pipeline import ImportSummary, ImportProgress  # noqa: F401  (re-exported)
 from services.variant_service import VariantService
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ImportSummary:
-    def __init__(self, root, added, skipped, duration):
-        self.root, self.added, self.skipped, self.duration = root, added, skipped, duration
-
-
 class ImportService(QObject):
     """
     Walks folders, inserts media rows, stacks variants.
+    All DB work runs in an ImportWorker with its own connection, the GUI only receives summaries.
+    Imports run one at a time (SQLite has a single writer), later scans wait in a queue.
     """
 
-    import_completed = Signal(object)  # emits ScanResult
+    import_progress = Signal(object)  # emits ImportProgress after every batch
+    import_completed = Signal(object)  # emits ImportSummary
 
     def __init__(self, dao: MediaDAO, variants: VariantService,
                  pool: QThreadPool, parent=None):
@@ -27,58 +27,38 @@ class ImportService(QObject):
         self.dao = dao
         self.variants = variants
         self.pool = pool
-
-    def scan(self, root: Path):
-        logger.info("Scanning folder %s", root)
-        worker = ScanWorker(root)
-        worker.finished.connect(self._on_scan_done)
-        self.pool.start(worker)
+        self._queue: deque[ImportWorker] = deque()
+        self._running = False
+
+    def scan(self, root: Path, engine: str = "scandir", *, incremental: bool = True):
+        """
+        :param root: Folder to import
+        :param engine: "scandir" (parallel, stat data included) or "walk" (legacy serial os.walk)
+        :param incremental: Skip listing directories whose mtime matches the scan_dirs cache
+        """
+        db_path = connection_path(self.dao.conn)
+        if db_path is None:
+            logger.error("Import needs a file-backed SQLite database, cannot scan %s", root)
+            return
+
+        logger.info("Scanning folder %s (%s, incremental=%s)", root, engine, incremental)
+        worker = ImportWorker(root, db_path, engine, incremental=incremental)
+        worker.progress.connect(self.import_progress)
+        worker.finished.connect(self._on_import_done)
+        self._queue.append(worker)
+        self._start_next()
+
+    def _start_next(self) -> None:
+        if self._running or not self._queue:
+            return
+        self._running = True
+        self.pool.start(self._queue.popleft())
 
     # ----------------------------------------------------------
 
-    def _on_scan_done(self, result: ScanResult):
-        added = skipped = 0
-        newly_added: list[tuple[int, str]] = []
-        parents: set[Path] = set()
-
-        # pre-fetch existing inodes for all scanned files
-        stats = {p: os.stat(p, follow_symlinks=False) for p in result.files}
-        inode_map = self.dao.fetch_many_inodes([st.st_ino for st in stats.values()])
-
-        with self.dao.conn:  # single transaction, rolls back on error
-            for path, st in stats.items():
-                inode = st.st_ino
-                rec = inode_map.get(inode)
-
-                # exact match -> skip
-                if rec and rec[1] == path:
-                    skipped += 1
-                    continue
-
-                # inode known but path moved -> update
-                if rec:
-                    self.dao.update_media_path(rec[0], path, int(st.st_mtime))
-                    skipped += 1
-                    continue
-
-                # brand-new file -> insert
-                mid = self.dao.insert_media(path, st)
-                newly_added.append((mid, path))
-                added += 1
-
-                parents.add(Path(path).parent)
-
-            # ensure all parent folders exist in DB
-            for folder in parents:
-                self.dao.insert_media(str(folder))
-
-            # Ensure import root itself is included
-            self.dao.insert_media(str(result.root))
-
-        # second pass: stack only the new ones
-        for mid, p in newly_added:
-            self.variants.detect_and_stack(mid, p)
-
-        self.import_completed.emit(
-            ImportSummary(result.root, added, skipped, result.duration)
-        )
+    def _on_import_done(self, summary: ImportSummary):
+        logger.info("Imported %s: %d added, %d skipped in %.1fs",
+                    summary.root, summary.added, summary.skipped, summary.duration)
+        self._running = False
+        self._start_next()
+        self.import_completed.emit(summary)
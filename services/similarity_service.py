@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import logging
+import os
+
+from PySide6.QtCore import QObject, QTimer
+
+from managers.dao import MediaDAO
+from utils.perceptual_hash import MultiIndexHash, SIMILAR_DISTANCE, hamming, to_db, from_db
+from workers.thumb_worker import path_dhash
+
+logger = logging.getLogger(__name__)
+
+# perceptual hashes from thumbnail workers are written in one transaction after this quiet period
+FLUSH_MS = 1000
+
+
+class SimilarityService(QObject):
+    """
+    Near-duplicate lookups over perceptual hashes. Hashes arrive from ThumbWorker as thumbnails are
+    generated, are buffered into media_phash, and are indexed in memory (MultiIndexHash) the first
+    time a similarity query runs.
+    """
+
+    def __init__(self, dao: MediaDAO, hash_size: int, parent=None):
+        super().__init__(parent)
+        self.dao = dao
+        self.hash_size = hash_size
+        self._pending: dict[str, int] = {}
+        self._index: MultiIndexHash | None = None
+        self._hash_of: dict[int, int] = {}  # media id -> current hash, filters superseded index entries
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(FLUSH_MS)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def record(self, path: str, phash: int) -> None:
+        """
+        Queue the hash of a freshly generated thumbnail.
+        """
+        self._pending[path] = phash
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self.dao.set_phashes([(to_db(h), p) for p, h in pending.items()])
+        if self._index is not None:
+            for path, mid in self.dao.ids_for_paths(list(pending)).items():
+                self._add(mid, pending[path])
+
+    def similar(self, path: str, radius: int = SIMILAR_DISTANCE) -> list[str]:
+        """
+        :param path: Query media
+        :param radius: Max Hamming distance between 64 bit hashes
+        :return: Paths of perceptually similar media, closest first, path itself excluded
+        """
+        phash = self._hash_for(path)
+        if phash is None:
+            return []
+        index = self._ensure_index()
+
+        ids, seen = [], set()
+        for _, mid in index.search(phash, radius):
+            current = self._hash_of.get(mid)
+            # an id re-hashed since indexing keeps its old entry too, only the current one counts
+            if mid in seen or current is None or hamming(phash, current) > radius:
+                continue
+            seen.add(mid)
+            ids.append(mid)
+        paths = self.dao.paths_for_ids(ids)
+        return [paths[mid] for mid in ids if mid in paths and paths[mid] != path]
+
+    def variant_candidates(self, path: str, radius: int = SIMILAR_DISTANCE) -> list[str]:
+        """
+        Similar files in the same folder that are not stacked yet, offered for add_variant.
+        """
+        folder = os.path.dirname(path)
+        siblings = [p for p in self.similar(path, radius) if os.path.dirname(p) == folder]
+        ids = self.dao.ids_for_paths(siblings)
+        return [p for p in siblings if p in ids and not self.dao.is_stacked(ids[p])]
+
+    # ----------------------------------------------------------
+
+    def _hash_for(self, path: str) -> int | None:
+        if path in self._pending:
+            return self._pending[path]
+        stored = self.dao.phash_for_path(path)
+        if stored is not None:
+            return from_db(stored)
+        phash = path_dhash(path, self.hash_size)  # never thumbnailed yet, decode it now
+        if phash is not None:
+            self.record(path, phash)
+            self.flush()
+        return phash
+
+    def _ensure_index(self) -> MultiIndexHash:
+        self.flush()
+        if self._index is None:
+            rows = self.dao.all_phashes()
+            self._hash_of = {mid: from_db(v) for mid, v in rows}
+            self._index = MultiIndexHash((h, mid) for mid, h in self._hash_of.items())
+            logger.info("Indexed %d perceptual hashes", len(self._hash_of))
+        return self._index
+
+    def _add(self, mid: int, phash: int) -> None:
+        if self._hash_of.get(mid) == phash:
+            return
+        self._hash_of[mid] = phash
+        self._index.add(phash, mid)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QPixmap
+
+from workers.thumb_worker import ThumbResult
+
+logger = logging.getLogger(__name__)
+
+# one delivery per display frame
+FRAME_MS = 16
+# pixmap conversion time per delivery, the rest of the frame is left for painting / scrolling
+_DRAIN_BUDGET_S = 0.008
+
+
+class ThumbDelivery(QObject):
+    """
+    Collects finished ThumbWorker results from any thread and hands them to the GUI thread in
+    frame-sized batches: at most one wake-up per FRAME_MS however many workers finish, and a
+    drain that runs out of its budget leaves the rest for the next frame.
+    """
+
+    def __init__(self, on_batch: Callable[[list[tuple[ThumbResult, QPixmap | None]]], None], parent=None):
+        """
+        :param on_batch: Runs on the GUI thread with [(result, pixmap or None)] in completion order
+        """
+        super().__init__(parent)
+        self._on_batch = on_batch
+        self._lock = threading.Lock()
+        self._queue: list[ThumbResult] = []  # filled by workers, guarded by _lock
+        self._scheduled = False
+        self._pending: deque[ThumbResult] = deque()  # GUI thread only
+        self._last_drain = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._drain)
+
+    def post(self, result: ThumbResult) -> None:
+        """
+        Thread-safe, called by workers.
+        """
+        with self._lock:
+            self._queue.append(result)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        # only the first result after a drain wakes the GUI thread
+        QTimer.singleShot(0, self, self._arm)
+
+    # ----------------------------------------------------------
+
+    def _arm(self) -> None:
+        if self._timer.isActive():
+            return
+        since = (time.perf_counter() - self._last_drain) * 1000
+        self._timer.start(max(0, int(FRAME_MS - since)))
+
+    def _drain(self) -> None:
+        with self._lock:
+            self._pending.extend(self._queue)
+            self._queue.clear()
+            self._scheduled = False
+
+        start = time.perf_counter()
+        batch = []
+        while self._pending and time.perf_counter() - start < _DRAIN_BUDGET_S:
+            r = self._pending.popleft()
+            batch.append((r, QPixmap.fromImage(r.image) if r.image is not None else None))
+        self._last_drain = time.perf_counter()
+        if self._pending:
+            self._timer.start(FRAME_MS)
+        if batch:
+            self._on_batch(batch)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import heapq
+import logging
+from typing import Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# queue tiers, lower runs first
+TIER_VISIBLE = 0
+TIER_PREFETCH = 1
+TIER_REST = 2
+
+# (path, thumbnail size): one path at two levels is two jobs
+ThumbJob = tuple[str, int]
+
+
+class ThumbScheduler:
+    """
+    Orders thumbnail jobs by what the views need first and feeds them to the thread pool a few at a time,
+    so the pool's own queue never holds thousands of stale jobs.
+
+    Each view is an owner: submit() replaces that owner's queue (a new folder cancels the old one's
+    pending work), prioritize() moves its visible / prefetch rows to the front. A path that is already
+    queued or running is never started twice, the running job's result serves every requester.
+    """
+
+    def __init__(self, start: Callable[[ThumbJob], None], max_in_flight: int):
+        """
+        :param start: Launches a (path, size) job, its completion must be reported through done(job)
+        :param max_in_flight: Jobs handed to the pool at once
+        """
+        self._start = start
+        self.max_in_flight = max(1, max_in_flight)
+        self._heap: list[tuple[int, int, ThumbJob]] = []  # (tier, rank, path), stale entries skipped lazily
+        self._tier: dict[ThumbJob, int] = {}  # queued job -> current tier
+        self._rank: dict[ThumbJob, int] = {}  # queued job -> row order within its tier
+        self._owners: dict[Hashable, set[ThumbJob]] = {}
+        self._boosted: dict[Hashable, set[ThumbJob]] = {}
+        self._running: set[ThumbJob] = set()
+        self.started = self.coalesced = self.cancelled = 0
+
+    # ------------------------------------------------------
+    def submit(self, owner: Hashable, paths: Iterable[ThumbJob], *, tier: int = TIER_REST, replace: bool = True) -> None:
+        """
+        Queue paths for owner, in the given order.
+        :param replace: Drop the owner's still queued paths first (new folder / new result set)
+        """
+        paths = list(paths)
+        if replace:
+            self.cancel(owner, keep=set(paths))
+        held = self._owners.setdefault(owner, set())
+        for rank, p in enumerate(paths):
+            held.add(p)
+            self._push(p, tier, rank)
+        self._pump()
+
+    def prioritize(self, owner: Hashable, visible: Iterable[ThumbJob], prefetch: Iterable[ThumbJob] = ()) -> None:
+        """
+        Move owner's visible paths, then its prefetch margin, ahead of everything else.
+        Paths boosted by a previous call that left the viewport fall back to TIER_REST.
+        """
+        held = self._owners.get(owner)
+        if not held:
+            return
+        boost = {}
+        for tier, paths in ((TIER_PREFETCH, prefetch), (TIER_VISIBLE, visible)):
+            boost.update((p, tier) for p in paths if p in held)
+        for p in self._boosted.get(owner, set()) - boost.keys():
+            if p in self._tier:
+                self._push(p, TIER_REST, self._rank[p], force=True)
+        for p, tier in boost.items():
+            self._push(p, tier, self._rank.get(p, 0), force=True)
+        self._boosted[owner] = set(boost)
+        self._pump()
+
+    def cancel(self, owner: Hashable, keep: set[ThumbJob] = frozenset()) -> None:
+        """
+        Forget owner's queued paths that no other owner still wants, running jobs finish normally.
+        :param keep: Paths the owner is about to re-submit
+        """
+        held = self._owners.pop(owner, set())
+        self._boosted.pop(owner, None)
+        if not held:
+            return
+        wanted = set(keep).union(*self._owners.values())
+        for p in held - wanted:
+            if self._tier.pop(p, None) is not None:
+                self._rank.pop(p, None)
+                self.cancelled += 1
+
+    def done(self, path: ThumbJob) -> None:
+        self._running.discard(path)
+        for held in self._owners.values():
+            held.discard(path)
+        self._pump()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self._tier),
+            "running": len(self._running),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+    # ------------------------------------------------------
+    def _push(self, path: ThumbJob, tier: int, rank: int, *, force: bool = False) -> None:
+        if path in self._running:
+            self.coalesced += 1
+            return
+        current = self._tier.get(path)
+        if current is not None and not force and current <= tier:
+            self.coalesced += 1
+            return
+        self._tier[path] = tier
+        self._rank[path] = rank
+        heapq.heappush(self._heap, (tier, rank, path))
+
+    def _pump(self) -> None:
+        heap = self._heap
+        while len(self._running) < self.max_in_flight and heap:
+            tier, rank, p = heapq.heappop(heap)
+            if self._tier.get(p) != tier or self._rank.get(p) != rank:
+                continue  # re-prioritised or cancelled since it was pushed
+            del self._tier[p], self._rank[p]
+            self._running.add(p)
+            self.started += 1
+            self._start(p)
+        if len(heap) > 4 * len(self._tier) + 1024:
+            # lazily deleted entries piled up (scroll-heavy sessions), rebuild from live state
+            self._heap = [(t, self._rank[p], p) for p, t in self._tier.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable
+
+from PySide6.QtCore import QObject, QSettings, QThreadPool, QTimer
+
+from managers.dao import MediaDAO
+from managers.db_utils import connection_path
+from workers.thumb_warm_worker import ThumbWarmWorker
+
+logger = logging.getLogger(__name__)
+
+# quiet time without thumbnail requests / scrolling before warm-up runs
+WARM_IDLE_MS = 3000
+# a queue left over from the previous session resumes this long after startup
+WARM_RESUME_MS = 15000
+# share of wall time spent warming, the next batch waits for the rest so the machine stays responsive
+WARM_DUTY = 0.5
+_SETTING = "warmThumbnails"
+
+
+class ThumbWarmupService(QObject):
+    """
+    Pre-generates disk-cached thumbnails for imported files while the user is not browsing.
+    The queue lives in thumb_warm (filled by the import pipeline), so an interrupted warm-up
+    picks up where it stopped on the next start. One short batch runs at a time at the lowest pool
+    priority, and a batch stops as soon as the views ask for thumbnails again. Batches are spaced by
+    the timer, never by sleeping in a pool thread the visible thumbnails need.
+    """
+
+    def __init__(self, dao: MediaDAO, pool: QThreadPool, disk, size: int,
+                 on_hash: Callable[[str, int], None], parent=None):
+        super().__init__(parent)
+        self.dao = dao
+        self.pool = pool
+        self.disk = disk
+        self.size = size
+        self.on_hash = on_hash
+        self._settings = QSettings("Oculus", "ImageViewer")
+        self.enabled = self._settings.value(_SETTING, True, bool)
+        self._running = False
+        self._last_activity = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._step)
+        if self.enabled:
+            self._timer.start(WARM_RESUME_MS)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._settings.setValue(_SETTING, enabled)
+        if enabled:
+            self.start()
+        else:
+            self._timer.stop()  # a running batch finishes, nothing new is started
+
+    def start(self) -> None:
+        """
+        Drain the queue once the user has been idle for WARM_IDLE_MS.
+        """
+        if self.enabled and not self._running:
+            self._timer.start(WARM_IDLE_MS)
+
+    def touch(self) -> None:
+        """
+        Record user activity (thumbnail demand, scrolling), pauses warm-up until idle again.
+        """
+        self._last_activity = time.monotonic()
+
+    def idle(self) -> bool:
+        # read from the worker thread, a float swap needs no lock
+        return time.monotonic() - self._last_activity >= WARM_IDLE_MS / 1000
+
+    # ----------------------------------------------------------
+
+    def _step(self) -> None:
+        if not self.enabled or self._running:
+            return
+        if not self.idle():
+            self._timer.start(WARM_IDLE_MS)
+            return
+        db_path = connection_path(self.dao.conn)
+        if db_path is None:
+            return
+        self._running = True
+        worker = ThumbWarmWorker(db_path, self.size, self.disk, self.idle)
+        worker.finished.connect(self._on_batch)
+        self.pool.start(worker, -2)  # below content hashing
+
+    def _on_batch(self, batch) -> None:
+        self._running = False
+        for path, phash in batch.hashes.items():
+            self.on_hash(path, phash)
+        if not batch.remaining:
+            if batch.warmed:
+                logger.info("Thumbnail warm-up finished")
+            return
+        logger.debug(f"Warmed {batch.warmed} thumbnails, {batch.remaining} queued")
+        if self.enabled:
+            pause_ms = int(batch.busy * (1 / WARM_DUTY - 1) * 1000)
+            self._timer.start(pause_ms if batch.warmed else WARM_IDLE_MS)
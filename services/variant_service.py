@@ -12,6 +12,12 @@ class VariantService:
     def detect_and_stack(self, media_id: int, path: str):
         self.dao.detect_and_stack(media_id, path)
 
+    def stack_batch(self, items: list[tuple[int, str]]) -> int:
+        """
+        Stack many freshly imported (media_id, path) pairs at once.
+        """
+        return self.dao.stack_variants_many(items)
+
     def is_variant(self, path: str) -> bool:
         return self.dao.is_variant(path)
 
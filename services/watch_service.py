@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import logging
+
+from PySide6.QtCore import QObject, Signal, QThreadPool, QTimer, QFileSystemWatcher
+
+from managers.dao import MediaDAO
+from managers.db_utils import connection_path
+from workers.dir_sync_worker import DirSyncWorker, SyncResult
+
+logger = logging.getLogger(__name__)
+
+# quiet period after the last event before a sync runs
+DEBOUNCE_MS = 500
+# how often directories that could not be watched natively are re-checked
+POLL_INTERVAL_MS = 30_000
+# stay well under the default inotify watch limit, the rest is polled
+MAX_WATCHED_DIRS = 8000
+
+
+class WatchService(QObject):
+    """
+    Keeps the media table in sync with the folders under every imported root.
+    Directory change events (or the polling fallback) are debounced into DirSyncWorker runs,
+    which reuse the import pipeline's inode matching so moves keep their media ids.
+    """
+
+    media_changed = Signal(object)  # emits SyncResult
+
+    def __init__(self, dao: MediaDAO, pool: QThreadPool, parent=None):
+        super().__init__(parent)
+        self.dao = dao
+        self.pool = pool
+        self._db_path = connection_path(dao.conn)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_dir_changed)
+        self._polled: set[str] = set()
+        self._dirty: set[str] = set()
+        self._busy = False
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._flush)
+
+        self._poll = QTimer(self)
+        self._poll.setInterval(POLL_INTERVAL_MS)
+        self._poll.timeout.connect(self._on_poll)
+
+    def watch_roots(self, roots: list[str]) -> None:
+        """
+        Watch every directory known below the given roots (from the scan_dirs cache).
+        """
+        if self._db_path is None:
+            logger.warning("Folder watching needs a file-backed database, disabled")
+            return
+        for root in roots:
+            self._add_dirs([root, *self.dao.scan_dir_cache(root)])
+        logger.info("Watching %d folders natively, polling %d",
+                    len(self._watcher.directories()), len(self._polled))
+
+    def refresh(self, folders: list[str]) -> None:
+        """
+        Reconcile folders with disk in the background, e.g. right after they were listed from the DB.
+        Unchanged folders cost one stat inside the worker, changes arrive through media_changed.
+        """
+        if self._db_path is None:
+            return
+        self._dirty.update(folders)
+        self._flush()
+
+    # ----------------------------------------------------------
+
+    def _add_dirs(self, dirs: list[str]) -> None:
+        watched = set(self._watcher.directories())
+        todo = [d for d in dict.fromkeys(dirs) if d not in watched and d not in self._polled]
+        room = max(0, MAX_WATCHED_DIRS - len(watched))
+        failed = self._watcher.addPaths(todo[:room]) if todo[:room] else []
+        self._polled.update(failed)
+        self._polled.update(todo[room:])
+        if self._polled and not self._poll.isActive():
+            self._poll.start()
+
+    def _remove_dirs(self, dirs: list[str]) -> None:
+        watched = set(self._watcher.directories())
+        native = [d for d in dirs if d in watched]
+        if native:
+            self._watcher.removePaths(native)
+        self._polled.difference_update(dirs)
+
+    def _on_dir_changed(self, path: str) -> None:
+        self._dirty.add(path)
+        self._debounce.start()  # restarts the quiet period
+
+    def _on_poll(self) -> None:
+        # unchanged folders are filtered by mtime inside the worker
+        self._dirty.update(self._polled)
+        self._flush()
+
+    def _flush(self) -> None:
+        if self._busy or not self._dirty:
+            return
+        folders, self._dirty = sorted(self._dirty), set()
+        self._busy = True
+        worker = DirSyncWorker(folders, self._db_path)
+        worker.finished.connect(self._on_synced)
+        self.pool.start(worker)
+
+    def _on_synced(self, result: SyncResult) -> None:
+        self._busy = False
+        if result.removed_dirs:
+            self._remove_dirs(result.removed_dirs)
+        if result.new_dirs:
+            self._add_dirs(result.new_dirs)
+            self._dirty.update(result.new_dirs)  # new folders may already hold files
+        if result:
+            logger.info("Folder sync: %d added, %d removed, %d moved",
+                        len(result.added), len(result.removed), len(result.moved))
+            self.media_changed.emit(result)
+        if self._dirty:
+            self._debounce.start()
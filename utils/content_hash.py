@@ -0,0 +1,45 @@
+"""
+Pure, picklable file hashing helpers used by HashWorker's process pool.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+
+# bytes read from each end of a file for the partial hash
+PARTIAL_BYTES = 64 * 1024
+_READ_CHUNK = 1024 * 1024
+
+
+def partial_hash(path: str) -> str | None:
+    """
+    Fast fingerprint: size + first and last PARTIAL_BYTES. Equal files always collide,
+    different files almost never do, so only collisions need a full hash.
+    """
+    try:
+        with open(path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            h = hashlib.blake2b(str(size).encode(), digest_size=16)
+            h.update(fp.read(PARTIAL_BYTES))
+            if size > 2 * PARTIAL_BYTES:
+                fp.seek(-PARTIAL_BYTES, os.SEEK_END)
+                h.update(fp.read(PARTIAL_BYTES))
+            elif size > PARTIAL_BYTES:
+                h.update(fp.read())
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def full_hash(path: str) -> str | None:
+    """
+    Strong hash of the whole file (BLAKE2b-256).
+    """
+    h = hashlib.blake2b(digest_size=32)
+    try:
+        with open(path, "rb") as fp:
+            while chunk := fp.read(_READ_CHUNK):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
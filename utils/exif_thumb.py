@@ -0,0 +1,72 @@
+"""
+Pull the embedded EXIF thumbnail (IFD1 JPEG) out of a JPEG without decoding the image.
+"""
+from __future__ import annotations
+
+import struct
+
+# EXIF lives in APP1, which is capped at 64 KiB, and comes before the image data
+_HEAD_BYTES = 128 * 1024
+_TAG_JPEG_OFFSET = 0x0201
+_TAG_JPEG_LENGTH = 0x0202
+
+
+def exif_thumbnail(path: str) -> bytes | None:
+    """
+    :return: The embedded thumbnail's JPEG bytes, None if the file has none or is not a JPEG
+    """
+    try:
+        with open(path, "rb") as fp:
+            head = fp.read(_HEAD_BYTES)
+    except OSError:
+        return None
+    if head[:2] != b"\xff\xd8":
+        return None
+
+    i = 2
+    while i + 4 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xDA, 0xD9):  # start of scan / end of image, no EXIF before the pixels
+            return None
+        seg_len = struct.unpack(">H", head[i + 2:i + 4])[0]
+        if marker == 0xE1 and head[i + 4:i + 10] == b"Exif\0\0":
+            return _ifd1_jpeg(head[i + 10:i + 2 + seg_len])
+        i += 2 + seg_len
+    return None
+
+
+def _ifd1_jpeg(tiff: bytes) -> bytes | None:
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None or len(tiff) < 8:
+        return None
+    try:
+        ifd0 = struct.unpack(order + "I", tiff[4:8])[0]
+        count = struct.unpack(order + "H", tiff[ifd0:ifd0 + 2])[0]
+        next_at = ifd0 + 2 + 12 * count
+        ifd1 = struct.unpack(order + "I", tiff[next_at:next_at + 4])[0]
+        if not ifd1:
+            return None
+
+        offset = length = None
+        count = struct.unpack(order + "H", tiff[ifd1:ifd1 + 2])[0]
+        for n in range(count):
+            entry = ifd1 + 2 + 12 * n
+            tag, typ = struct.unpack(order + "HH", tiff[entry:entry + 4])
+            fmt = order + ("H" if typ == 3 else "I")
+            value = struct.unpack(fmt, tiff[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+            if tag == _TAG_JPEG_OFFSET:
+                offset = value
+            elif tag == _TAG_JPEG_LENGTH:
+                length = value
+    except struct.error:
+        return None  # truncated / corrupt EXIF
+
+    if offset is None or not length:
+        return None
+    data = tiff[offset:offset + length]
+    return data if len(data) == length and data[:2] == b"\xff\xd8" else None
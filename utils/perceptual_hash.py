@@ -0,0 +1,155 @@
+"""
+Perceptual (difference) hashing and a multi-index hash table for near-duplicate lookups.
+Qt free, ThumbWorker feeds it the grey pixels of thumbnails it already decoded.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import combinations
+from typing import Iterable
+
+import numpy as np
+
+# 8 x 8 comparisons -> 64 bit hash
+HASH_SIZE = 8
+# Hamming distance still treated as "the same picture" (re-encode, resize, light edit)
+SIMILAR_DISTANCE = 10
+
+_SIGN_BIT = 1 << 63
+_CHUNKS = 4
+# recent adds are scanned linearly until there are enough to be worth re-sorting the chunk tables
+_PENDING_MIN = 4096
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _shrink(gray: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """
+    Area-average resize of a 2D array, nearest sampling for images smaller than the target.
+    """
+    h, w = gray.shape
+    if h < rows or w < cols:
+        ys = np.arange(rows) * h // rows
+        xs = np.arange(cols) * w // cols
+        return gray[np.ix_(ys, xs)].astype(np.float32)
+    ys = np.arange(rows) * h // rows
+    xs = np.arange(cols) * w // cols
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float32), ys, axis=0), xs, axis=1)
+    counts = np.outer(np.diff(np.append(ys, h)), np.diff(np.append(xs, w)))
+    return sums / counts
+
+
+def dhash(gray: np.ndarray) -> int:
+    """
+    Difference hash of a greyscale image: one bit per horizontally adjacent pair of an 8 x 9 shrink.
+    :param gray: 2D array of luminance values, any size
+    :return: Unsigned 64 bit hash
+    """
+    small = _shrink(gray, HASH_SIZE, HASH_SIZE + 1)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_db(h: int) -> int:
+    """SQLite integers are signed 64 bit."""
+    return h - (1 << 64) if h & _SIGN_BIT else h
+
+
+def from_db(v: int) -> int:
+    return v + (1 << 64) if v < 0 else v
+
+
+class MultiIndexHash:
+    """
+    Multi-index hash table over Hamming distance. The 64 bit hash is split into four 16 bit chunks,
+    any hash within radius r of a query matches it in at least one chunk to within r // 4 bits,
+    so only the sorted buckets of those chunk neighbours are gathered and verified.
+    Everything is NumPy: a lookup over a million hashes touches a few thousand candidates.
+    """
+
+    def __init__(self, entries: Iterable[tuple[int, int]] = ()):
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._items = np.empty(0, dtype=np.int64)
+        self._order: list[np.ndarray] = []   # per chunk, positions sorted by chunk value
+        self._keys: list[np.ndarray] = []    # per chunk, the sorted chunk values
+        self._pending: list[tuple[int, int]] = []
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self._hashes) + len(self._pending)
+
+    def add(self, h: int, item: int) -> None:
+        """
+        :param h: 64 bit hash
+        :param item: Payload, media id here
+        """
+        self._pending.append((h, item))
+        if len(self._pending) >= max(_PENDING_MIN, len(self._hashes) // 8):
+            self._rebuild()
+
+    def extend(self, entries: Iterable[tuple[int, int]]) -> None:
+        self._pending.extend(entries)
+        self._rebuild()
+
+    def search(self, h: int, radius: int = SIMILAR_DISTANCE) -> list[tuple[int, int]]:
+        """
+        :return: (distance, item) pairs within radius, closest first
+        """
+        recent = [(d, item) for ph, item in self._pending if (d := (h ^ ph).bit_count()) <= radius]
+        if not len(self._hashes):
+            return sorted(recent)
+
+        flips = _flip_masks(radius // _CHUNKS)
+        found = []
+        for c in range(_CHUNKS):
+            chunk = (h >> (16 * c)) & 0xFFFF
+            probes = np.unique(flips ^ chunk)
+            lo = np.searchsorted(self._keys[c], probes, side="left")
+            hi = np.searchsorted(self._keys[c], probes, side="right")
+            hit = hi > lo
+            if hit.any():
+                found.extend(self._order[c][a:b] for a, b in zip(lo[hit], hi[hit]))
+        if not found:
+            return sorted(recent)
+
+        pos = np.unique(np.concatenate(found))
+        dist = _popcount(self._hashes[pos] ^ np.uint64(h))
+        keep = dist <= radius
+        pos, dist = pos[keep], dist[keep]
+        ranked = np.argsort(dist, kind="stable")
+        hits = list(zip(dist[ranked].tolist(), self._items[pos[ranked]].tolist()))
+        return sorted(hits + recent) if recent else hits
+
+    def _rebuild(self) -> None:
+        if not self._pending:
+            return
+        hashes, items = zip(*self._pending)
+        self._pending.clear()
+        self._hashes = np.concatenate([self._hashes, np.array(hashes, dtype=np.uint64)])
+        self._items = np.concatenate([self._items, np.array(items, dtype=np.int64)])
+        self._order, self._keys = [], []
+        for c in range(_CHUNKS):
+            chunk = ((self._hashes >> np.uint64(16 * c)) & np.uint64(0xFFFF)).astype(np.uint16)
+            order = np.argsort(chunk, kind="stable")
+            self._order.append(order)
+            self._keys.append(chunk[order])
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values).astype(np.int64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+@lru_cache(maxsize=8)
+def _flip_masks(bits: int) -> np.ndarray:
+    """
+    Every 16 bit mask with at most bits set, i.e. the XOR offsets of a chunk's neighbours.
+    """
+    masks = [0]
+    for k in range(1, min(bits, 16) + 1):
+        masks.extend(sum(1 << i for i in combo) for combo in combinations(range(16), k))
+    return np.array(masks, dtype=np.int64)
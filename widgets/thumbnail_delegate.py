@@ -0,0 +1,54 @@
+# widgets/thumbnail_delegate.py
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtGui import QColor, QFont, QPainter
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+
+from models.thumbnail_model import STACK_ROLE
+
+_BADGE_COLOR = QColor("#5e5eff")
+
+
+def paint_stack_badge(painter: QPainter, rect: QRect) -> None:
+    """
+    Paint a small purple 'S' badge in the bottom right corner of rect (the drawn thumbnail).
+    """
+    badge = max(12, rect.width() // 6)  # scale with thumb
+    x = rect.right() - badge - 1
+    y = rect.bottom() - badge - 1
+
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setBrush(_BADGE_COLOR)
+    painter.setPen(Qt.NoPen)
+    painter.drawEllipse(x, y, badge, badge)
+
+    # white 'S'
+    painter.setPen(Qt.white)
+    f = QFont()
+    f.setBold(True)
+    f.setPixelSize(badge - 4)
+    painter.setFont(f)
+    painter.drawText(x, y, badge, badge, Qt.AlignCenter, "S")
+    painter.restore()
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """
+    Default item painting plus the stack badge over the thumbnail of rows with STACK_ROLE set.
+    The badge is drawn at paint time, so badged and plain rows share one cached pixmap.
+    """
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index) -> None:
+        super().paint(painter, option, index)
+        if not index.data(STACK_ROLE):
+            return
+
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        if opt.icon.isNull():
+            return  # thumbnail not generated yet
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        area = style.subElementRect(QStyle.SE_ItemViewItemDecoration, opt, opt.widget)
+        # the icon keeps its aspect ratio inside the decoration area, badge its actual corner
+        drawn = QStyle.alignedRect(opt.direction, opt.decorationAlignment, opt.icon.actualSize(area.size()), area)
+        paint_stack_badge(painter, drawn)
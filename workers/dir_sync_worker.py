@@ -0,0 +1,106 @@
+import logging
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QRunnable, Signal, QObject
+
+from managers.dao import MediaDAO
+from managers.db_utils import get_db_connection
+from services.import_pipeline import ImportPipeline
+from services.variant_service import VariantService
+from workers.scan_worker import ScanBatch, scan_dir
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult:
+    def __init__(self, added, removed, moved, new_dirs, removed_dirs):
+        self.added: list[str] = added
+        self.removed: list[str] = removed
+        self.moved: list[tuple[str, str]] = moved  # (old, new)
+        self.new_dirs: list[str] = new_dirs
+        self.removed_dirs: list[str] = removed_dirs
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.moved or self.new_dirs or self.removed_dirs)
+
+
+class DirSyncWorker(QRunnable, QObject):
+    """
+    Re-lists a set of directories (non-recursive) and applies the difference to the media table.
+    Directories whose mtime still matches scan_dirs are skipped, so the same worker serves both
+    watcher events and the polling fallback.
+    """
+    finished = Signal(object)
+
+    def __init__(self, folders: list[str], db_path: str):
+        QRunnable.__init__(self)
+        QObject.__init__(self)
+        self.folders = folders
+        self.db_path = db_path
+        self.setAutoDelete(True)
+
+    def run(self):
+        conn = get_db_connection(db_path=self.db_path, backend="sqlite")
+        try:
+            self.finished.emit(self._sync(MediaDAO(conn)))
+        except Exception:
+            logger.exception("Folder sync failed for %d folders", len(self.folders))
+            self.finished.emit(SyncResult([], [], [], [], []))
+        finally:
+            conn.close()
+
+    def _sync(self, dao: MediaDAO) -> SyncResult:
+        cache = dao.scan_dir_entries(self.folders)
+        removed: list[str] = []
+        removed_dirs: list[str] = []
+        new_dirs: list[str] = []
+        moved: list[tuple[str, str]] = []
+        entries, records = [], []
+
+        for folder in self.folders:
+            if folder in removed_dirs:
+                continue  # already dropped together with its parent
+            if not os.path.isdir(folder):
+                removed_dirs.append(folder)
+                removed.extend(dao.remove_tree(folder))
+                continue
+
+            found, subdirs, record = scan_dir(folder, cache)
+            if record is None:
+                continue  # unchanged since last listing
+            known_subdirs = set(cache.get(folder, (None, []))[1])
+            fresh = [e for e in found if e.is_dir and e.path not in known_subdirs]
+            gone = known_subdirs - set(subdirs)
+
+            # a vanished folder whose inode re-appears under a new name was renamed, keep its rows
+            known = dao.fetch_many_inodes([e.inode for e in fresh]) if fresh and gone else {}
+            renamed = {}
+            for e in fresh:
+                rec = known.get(e.inode)
+                if rec and rec[1] in gone:
+                    renamed[rec[1]] = e.path
+            for old, new in renamed.items():
+                moved.extend(dao.move_tree(old, new))
+            for d in gone - renamed.keys():
+                removed.extend(dao.remove_tree(d))
+
+            removed_dirs.extend(gone)
+            new_dirs.extend(e.path for e in fresh)
+            entries.extend(found)
+            records.append(record)
+
+        if not records:
+            return SyncResult([], removed, moved, new_dirs, removed_dirs)
+
+        # same inode matching / insert / stacking as an import
+        pipeline = ImportPipeline(dao, VariantService(dao), Path(self.folders[0]), track_changes=True)
+        pipeline.process(ScanBatch(Path(self.folders[0]), entries, len(records), 0, records))
+
+        # anything still recorded in a listed folder but not on disk is gone
+        on_disk = {e.path for e in entries if not e.is_dir}
+        missing = [p for r in records for p in dao.media_in_dir(r.path) if p not in on_disk]
+        dao.delete_media_paths(missing)
+        removed.extend(missing)
+
+        return SyncResult(pipeline.added_paths, removed, moved + pipeline.moved, new_dirs, removed_dirs)
@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PySide6.QtCore import QRunnable, Signal, QObject
+
+from managers.dao import MediaDAO
+from managers.db_utils import get_db_connection
+from utils.content_hash import partial_hash, full_hash
+
+logger = logging.getLogger(__name__)
+
+# rows pulled from the DB per round, keeps memory flat on multi-million file libraries
+HASH_BATCH = 5000
+HASH_PROCESSES = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+class HashSummary:
+    def __init__(self, partial, full, groups, error=None):
+        self.partial, self.full, self.groups = partial, full, groups
+        self.error: str | None = error
+
+
+class HashWorker(QRunnable, QObject):
+    """
+    Brings media_hashes up to date: partial hashes for new / changed files, then full hashes
+    only for files whose partial hash collides. Unchanged files are never re-read.
+    """
+    progress = Signal(int, int)  # done, total
+    finished = Signal(object)  # HashSummary
+
+    def __init__(self, db_path: str, processes: int = HASH_PROCESSES):
+        QRunnable.__init__(self)
+        QObject.__init__(self)
+        self.db_path = db_path
+        self.processes = processes
+        self.setAutoDelete(True)
+
+    def run(self):
+        conn = get_db_connection(db_path=self.db_path, backend="sqlite")
+        try:
+            self.finished.emit(self._hash(MediaDAO(conn)))
+        except Exception as exc:
+            logger.exception("Content hashing failed")
+            self.finished.emit(HashSummary(0, 0, 0, error=str(exc)))
+        finally:
+            conn.close()
+
+    def _hash(self, dao: MediaDAO) -> HashSummary:
+        total = dao.count_stale_hashes()
+        n_partial = n_full = 0
+        # spawn, not fork: forking this multi-threaded Qt process can deadlock the children
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=ctx) as ex:
+            while rows := dao.stale_hash_rows(HASH_BATCH):
+                digests = ex.map(partial_hash, [r[1] for r in rows], chunksize=64)
+                dao.set_partial_hashes([(mid, size, mtime, d) for (mid, _, size, mtime), d in zip(rows, digests)])
+                n_partial += len(rows)
+                self.progress.emit(n_partial, total)
+
+            while rows := dao.partial_collisions_missing_full(HASH_BATCH):
+                digests = ex.map(full_hash, [p for _, p in rows], chunksize=8)
+                dao.set_full_hashes([(d or "", mid) for (mid, _), d in zip(rows, digests)])
+                n_full += len(rows)
+
+        groups = len(dao.duplicate_groups()) if n_full else 0
+        logger.info("Hashed %d files (%d full), %d duplicate groups", n_partial, n_full, groups)
+        return HashSummary(n_partial, n_full, groups)
@@ -0,0 +1,53 @@
+import logging
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QRunnable, Signal, QObject
+
+from managers.dao import MediaDAO
+from managers.db_utils import get_db_connection
+from services.import_pipeline import ImportPipeline, ImportSummary
+from services.variant_service import VariantService
+from workers.scan_worker import iter_scan_batches, iter_walk_batches
+
+logger = logging.getLogger(__name__)
+
+
+class ImportWorker(QRunnable, QObject):
+    """
+    Runs a whole import off the GUI thread: scan, inode diff, insert and variant stacking.
+    Owns a private SQLite connection, only ImportProgress / ImportSummary objects cross back.
+    """
+    progress = Signal(object)
+    finished = Signal(object)
+
+    def __init__(self, root: Path, db_path: str, engine: str = "scandir", *, incremental: bool = True):
+        QRunnable.__init__(self)
+        QObject.__init__(self)
+        self.root = root
+        self.db_path = db_path
+        self.engine = engine
+        self.incremental = incremental
+        self.setAutoDelete(True)
+
+    def run(self):
+        start = time.time()
+        pipeline = None
+        conn = get_db_connection(db_path=self.db_path, backend="sqlite")
+        try:
+            dao = MediaDAO(conn)
+            pipeline = ImportPipeline(dao, VariantService(dao), self.root)
+            if self.engine == "walk":
+                batches = iter_walk_batches(self.root)
+            else:
+                dir_cache = dao.scan_dir_cache(str(self.root)) if self.incremental else None
+                batches = iter_scan_batches(self.root, dir_cache=dir_cache)
+            for batch in batches:
+                self.progress.emit(pipeline.process(batch))
+            self.finished.emit(pipeline.finish())
+        except Exception as exc:
+            logger.exception("Import of %s failed", self.root)
+            added, skipped = (pipeline.added, pipeline.skipped) if pipeline else (0, 0)
+            self.finished.emit(ImportSummary(self.root, added, skipped, time.time() - start, error=str(exc)))
+        finally:
+            conn.close()
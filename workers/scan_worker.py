@@ -1,35 +1,205 @@
 import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-
-from PySide6.QtCore import QRunnable, Signal, QObject
+from typing import Iterator, Mapping, NamedTuple, Sequence
 
 IMAGE_EXT = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".mp4", ".mkv", ".mov", ".avi"}
 
+# upper bound on concurrent directory listings, NAS mounts stop scaling past this
+MAX_SCAN_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+
+# entries per streamed batch
+SCAN_BATCH_SIZE = 2000
+# directory listings submitted per worker, the rest wait as plain paths until the consumer catches up
+DIRS_PER_WORKER = 2
+
+# directories modified more recently than this are re-listed on the next scan
+_MTIME_SETTLE_S = 2.0
+
+
+class ScanEntry(NamedTuple):
+    """
+    One file or folder found by the scanner, carrying the stat data the import needs.
+    """
+    path: str
+    inode: int
+    size: int
+    mtime: int
+    is_dir: bool
+
+    # os.stat_result-compatible accessors so an entry can stand in for a stat call
+    @property
+    def st_ino(self) -> int:
+        return self.inode
+
+    @property
+    def st_size(self) -> int:
+        return self.size
+
+    @property
+    def st_mtime(self) -> int:
+        return self.mtime
+
+
+class ScanDir(NamedTuple):
+    """
+    Fingerprint of one directory that was actually listed, persisted in the scan_dirs table.
+    mtime is None when it was too fresh to trust, which forces a re-list next time.
+    """
+    path: str
+    parent: str
+    mtime: int | None  # st_mtime_ns taken before listing
+    entry_count: int
+    subdirs: list[str]
+
+
+# {dir path: (mtime_ns or None, [child dir paths])} as loaded by MediaDAO.scan_dir_cache
+DirCache = Mapping[str, tuple[int | None, list[str]]]
+
+
+class ScanBatch(NamedTuple):
+    """
+    A chunk of scanned entries plus directory counters used for progress / ETA estimates.
+    """
+    root: Path
+    entries: list[ScanEntry]
+    dirs_done: int
+    dirs_pending: int
+    dirs: Sequence[ScanDir] = ()  # directories listed in this batch
+
+
+def _is_media(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXT
+
+
+def walk_files(root: str | Path) -> list[str]:
+    """
+    Legacy serial engine: os.walk the tree and return matching file paths (no stat data).
+    """
+    found = []
+    for dirpath, _, files in os.walk(root):
+        for fn in files:
+            if _is_media(fn):
+                found.append(os.path.join(dirpath, fn))
+    return found
+
+
+def iter_walk_batches(root: str | Path, batch_size: int = SCAN_BATCH_SIZE) -> Iterator[ScanBatch]:
+    """
+    Legacy serial engine in streaming form, stats each file with os.stat.
+    Folders are recorded without an mtime, so this engine never prunes on a later scan.
+    """
+    batch: list[ScanEntry] = []
+    dirs: list[ScanDir] = []
+    dirs_done = 0
+    for dirpath, dirnames, files in os.walk(root):
+        dirs_done += 1
+        dirs.append(ScanDir(dirpath, os.path.dirname(dirpath), None, len(dirnames) + len(files),
+                            [os.path.join(dirpath, d) for d in dirnames]))
+        for fn in files:
+            if not _is_media(fn):
+                continue
+            path = os.path.join(dirpath, fn)
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            batch.append(ScanEntry(path, st.st_ino, st.st_size, int(st.st_mtime), False))
+        if len(batch) >= batch_size or len(dirs) >= batch_size:
+            yield ScanBatch(Path(root), batch, dirs_done, 0, dirs)
+            batch, dirs = [], []
+    if batch or dirs:
+        yield ScanBatch(Path(root), batch, dirs_done, 0, dirs)
+
+
+def scan_dir(folder: str, cache: DirCache | None = None) -> tuple[list[ScanEntry], list[str], ScanDir | None]:
+    """
+    List a single directory. Returns (entries, subdirs, record), entries include the subdirs themselves.
+    If cache holds a matching mtime for folder the listing is skipped: no entries, the cached
+    subdirs and no record are returned.
+    """
+    entries: list[ScanEntry] = []
+    subdirs: list[str] = []
+    try:
+        st = os.stat(folder)
+    except OSError:
+        return entries, subdirs, None
+
+    cached = cache.get(folder) if cache is not None else None
+    if cached and cached[0] is not None and cached[0] == st.st_mtime_ns:
+        return entries, list(cached[1]), None
+
+    count = 0
+    try:
+        it = os.scandir(folder)
+    except OSError:
+        return entries, subdirs, None
+
+    with it:
+        for de in it:
+            count += 1
+            try:
+                if de.is_dir(follow_symlinks=False):
+                    dst = de.stat(follow_symlinks=False)
+                    entries.append(ScanEntry(de.path, dst.st_ino, 0, int(dst.st_mtime), True))
+                    subdirs.append(de.path)
+                elif de.is_file(follow_symlinks=False) and _is_media(de.name):
+                    dst = de.stat(follow_symlinks=False)
+                    entries.append(ScanEntry(de.path, dst.st_ino, dst.st_size, int(dst.st_mtime), False))
+            except OSError:
+                continue  # vanished mid-scan / permission denied
+
+    # coarse-mtime filesystems (FAT, many NAS shares) could hide a change made in the same tick
+    mtime = st.st_mtime_ns if time.time() - st.st_mtime > _MTIME_SETTLE_S else None
+    record = ScanDir(folder, os.path.dirname(folder), mtime, count, subdirs)
+    return entries, subdirs, record
+
+
+def iter_scan_batches(root: str | Path, batch_size: int = SCAN_BATCH_SIZE,
+                      max_workers: int = MAX_SCAN_WORKERS,
+                      dir_cache: DirCache | None = None) -> Iterator[ScanBatch]:
+    """
+    Parallel engine: fan directories out across a bounded thread pool using os.scandir and
+    yield entries in chunks of roughly batch_size. os.scandir releases the GIL while waiting
+    on the filesystem, so listings overlap on slow mounts.
+    :param root: Folder to scan recursively
+    :param batch_size: Entries per yielded batch
+    :param max_workers: Maximum number of directories listed concurrently
+    :param dir_cache: Previous scan_dirs fingerprints, directories whose mtime is unchanged are
+                      not listed, only their known sub-folders are visited
+    :return: Batches of ScanEntry for every media file and folder below root (root itself excluded)
+    """
+    batch: list[ScanEntry] = []
+    dirs: list[ScanDir] = []
+    dirs_done = 0
+    # at most max_in_flight listings run or sit finished while the consumer handles a batch,
+    # so memory does not grow with the tree however slow the import side is
+    max_in_flight = max_workers * DIRS_PER_WORKER
+    queued: deque[str] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan") as ex:
+        pending = {ex.submit(scan_dir, str(root), dir_cache)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                entries, subdirs, record = fut.result()
+                dirs_done += 1
+                batch.extend(entries)
+                if record is not None:
+                    dirs.append(record)
+                queued.extend(subdirs)
+            while queued and len(pending) < max_in_flight:
+                pending.add(ex.submit(scan_dir, queued.popleft(), dir_cache))
+            if len(batch) >= batch_size or len(dirs) >= batch_size:
+                yield ScanBatch(Path(root), batch, dirs_done, len(pending) + len(queued), dirs)
+                batch, dirs = [], []
+    if batch or dirs:
+        yield ScanBatch(Path(root), batch, dirs_done, 0, dirs)
+
 
-class ScanResult:
-    def __init__(self, root: Path, files: list[str], duration: float):
-        self.root = root
-        self.files = files
-        self.duration = duration
-
-
-class ScanWorker(QRunnable, QObject):
-    finished = Signal(object)
-
-    def __init__(self, root: Path):
-        QRunnable.__init__(self)
-        QObject.__init__(self)
-        self.root = root
-        self.setAutoDelete(True)
-
-    def run(self):
-        start = time.time()
-        found = []
-        for dirpath, _, files in os.walk(self.root):
-            for fn in files:
-                if Path(fn).suffix.lower() in IMAGE_EXT:
-                    found.append(str(Path(dirpath) / fn))
-        self.finished.emit(
-            ScanResult(self.root, found, time.time() - start)
-        )
+def scandir_entries(root: str | Path, max_workers: int = MAX_SCAN_WORKERS) -> list[ScanEntry]:
+    """
+    Collect the whole parallel scan into one list (benchmarks / small trees).
+    """
+    return [e for b in iter_scan_batches(root, max_workers=max_workers) for e in b.entries]
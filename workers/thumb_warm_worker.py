@@ -0,0 +1,74 @@
+import logging
+import time
+from pathlib import Path
+from typing import Callable
+
+from PySide6.QtCore import QRunnable, Signal, QObject
+
+from managers.dao import MediaDAO
+from managers.db_utils import get_db_connection
+from workers.thumb_worker import VIDEO_SUFFIXES, VideoProbe, image_dhash, render_thumb
+
+logger = logging.getLogger(__name__)
+
+# queued files handled per run at most, the pool thread is given back in between
+WARM_BATCH = 32
+# decode time after which a run ends early, so a pool slot is never held for long
+WARM_SLICE_S = 0.5
+
+
+class WarmBatch:
+    def __init__(self, warmed, hashes, remaining, busy=0.0):
+        self.warmed, self.remaining = warmed, remaining
+        self.hashes: dict[str, int] = hashes  # perceptual hashes of freshly decoded files
+        self.busy = busy  # seconds spent decoding, the service spaces the next run by it
+
+
+class ThumbWarmWorker(QRunnable, QObject):
+    """
+    Generates disk-cached thumbnails for one batch of the thumb_warm queue, oldest folders first.
+    Stops early as soon as idle() turns False or WARM_SLICE_S of decoding is spent, unfinished files
+    stay queued for the next run.
+    """
+    finished = Signal(object)  # WarmBatch
+
+    def __init__(self, db_path: str, size: int, disk, idle: Callable[[], bool],
+                 batch: int = WARM_BATCH, slice_s: float = WARM_SLICE_S):
+        QRunnable.__init__(self)
+        QObject.__init__(self)
+        self.db_path = db_path
+        self.size, self.disk, self.idle = size, disk, idle
+        self.batch, self.slice_s = batch, slice_s
+        self.setAutoDelete(True)
+
+    def run(self):
+        conn = get_db_connection(db_path=self.db_path, backend="sqlite")
+        try:
+            self.finished.emit(self._warm(MediaDAO(conn)))
+        except Exception:
+            logger.exception("Thumbnail warm-up failed")
+            self.finished.emit(WarmBatch(0, {}, 0))
+        finally:
+            conn.close()
+
+    def _warm(self, dao: MediaDAO) -> WarmBatch:
+        done, hashes = [], {}
+        t0 = time.perf_counter()
+        for mid, path in dao.thumb_warm_batch(self.batch):
+            if not self.idle() or time.perf_counter() - t0 >= self.slice_s:
+                break
+            probe = None
+            if Path(path).suffix.lower() in VIDEO_SUFFIXES:
+                cached = dao.video_probe(path)
+                probe = VideoProbe(*cached) if cached else None
+
+            img, new_probe, decoded = render_thumb(path, self.size, self.disk, probe)
+            if new_probe is not None:
+                dao.set_video_probe(path, *new_probe)
+            if decoded and img is not None:
+                hashes[path] = image_dhash(img)
+            done.append(mid)  # unreadable files are dropped too, a view request retries them
+        busy = time.perf_counter() - t0
+
+        dao.drop_thumb_warm(done)
+        return WarmBatch(len(done), hashes, dao.count_thumb_warm(), busy)
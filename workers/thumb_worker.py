@@ -1,62 +1,262 @@
+import logging
 from pathlib import Path
+from typing import NamedTuple
 import cv2
+import numpy as np
 
-from PySide6.QtCore import QRunnable, Qt, QTimer
-from PySide6.QtGui import QImage, QPixmap
-from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QRunnable, Qt, QSize
+from PySide6.QtGui import QImage, QImageReader
+
+from utils.exif_thumb import exif_thumbnail
+from utils.perceptual_hash import dhash
+
+logger = logging.getLogger(__name__)
 
 VIDEO_SUFFIXES = {".mp4", ".mkv", ".webm", ".mov", ".avi"}
+JPEG_SUFFIXES = {".jpg", ".jpeg"}
+# embedded previews whose aspect ratio differs more than this from the image are letterboxed
+_EXIF_ASPECT_TOLERANCE = 0.02
+# video thumbnails show the frame ~3 s in, clips shorter than this use their first frame
+VIDEO_THUMB_AT_MS = 3000
+_SHORT_CLIP_MS = 1000
+# edge lengths thumbnails are generated and cached at, views pick the level matching their icon size
+THUMB_LEVELS = (64, 128, 256, 512)
+
+
+class VideoProbe(NamedTuple):
+    duration_ms: int  # 0 when the container does not say
+    fps: float
+    width: int
+    height: int
+
+
+class ThumbResult(NamedTuple):
+    path: str
+    size: int
+    image: QImage | None  # None if the file cannot be decoded
+    phash: int | None  # set only for fresh decodes
+    probe: VideoProbe | None  # set only when the video was probed by this job
 
 
 # ------------------------------------------------------------------ helpers
-def _generate_thumb(path: str, size: int) -> QImage:
+def thumb_level(px: float) -> int:
+    """
+    Smallest level covering an icon of px device pixels, the largest level beyond that.
+    """
+    return next((lvl for lvl in THUMB_LEVELS if lvl >= px), THUMB_LEVELS[-1])
 
-    suffix = Path(path).suffix.lower()
 
-    # ----- images & GIFs --------------------------------------------------
-    if suffix not in VIDEO_SUFFIXES:
-        img = QImage(path)
-        if img.isNull():
-            return QImage()
-        return img.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+def _exif_thumb(path: str, src: QSize, size: int) -> QImage | None:
+    """
+    The embedded EXIF preview, if it is big enough for size and has the image's aspect ratio
+    (letterboxed previews would show black bars).
+    """
+    data = exif_thumbnail(path)
+    if data is None:
+        return None
+    img = QImage.fromData(data)
+    if img.isNull() or max(img.width(), img.height()) < min(size, max(src.width(), src.height())):
+        return None
+    if abs(img.width() / img.height() - src.width() / src.height()) > _EXIF_ASPECT_TOLERANCE:
+        return None
+    return _fit(img, size)
 
-    # ----- videos ---------------------------------------------------------
-    cap = cv2.VideoCapture(path)
-    if not cap.isOpened():
+
+def _fit(img: QImage, size: int) -> QImage:
+    if max(img.width(), img.height()) == size:
+        return img
+    return img.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def _image_thumb(path: str, suffix: str, size: int) -> QImage:
+    reader = QImageReader(path)
+    src = reader.size()
+    if suffix in JPEG_SUFFIXES and src.isValid():
+        img = _exif_thumb(path, src, size)
+        if img is not None:
+            return img
+    if src.isValid() and (src.width() > size or src.height() > size):
+        # decoder-side downscale: JPEG uses DCT scaling, other formats scale right after decoding
+        reader.setScaledSize(src.scaled(size, size, Qt.KeepAspectRatio))
+    img = reader.read()
+    if img.isNull():
         return QImage()
+    return _fit(img, size)
+
+
+def probe_video(cap) -> VideoProbe:
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+    duration_ms = int(frames / fps * 1000) if fps > 0 and frames > 0 else 0
+    return VideoProbe(duration_ms, fps,
+                      int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+
+def _frame_time_ms(probe: VideoProbe) -> int:
+    """
+    Where the thumbnail frame is taken: ~3 s in, proportionally earlier for short clips.
+    Unknown durations keep the 3 s target and rely on the read-failure fallback.
+    """
+    if probe.duration_ms <= 0:
+        return VIDEO_THUMB_AT_MS
+    if probe.duration_ms < _SHORT_CLIP_MS:
+        return 0  # first frame is always a keyframe, nothing to decode up to
+    return min(VIDEO_THUMB_AT_MS, probe.duration_ms // 2)
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30
-    cap.set(cv2.CAP_PROP_POS_FRAMES, int(fps) * 3)    # seek ~3 s in
-    ok, frame = cap.read()
-    cap.release()
+
+def _video_frame(path: str, probe: VideoProbe | None) -> tuple[QImage, VideoProbe | None]:
+    """
+    One capture per file: probe (unless cached), seek, read a single frame at full resolution.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return QImage(), probe
+    try:
+        if probe is None:
+            probe = probe_video(cap)
+        at = _frame_time_ms(probe)
+        if at:
+            # timestamp seek lands on the preceding keyframe and decodes forward from there,
+            # unlike POS_FRAMES which some demuxers resolve by counting frames
+            cap.set(cv2.CAP_PROP_POS_MSEC, at)
+        ok, frame = cap.read()
+        if not ok and at:
+            # seek past the end (wrong duration metadata, very short clip): take the first frame
+            cap.set(cv2.CAP_PROP_POS_MSEC, 0)
+            ok, frame = cap.read()
+    finally:
+        cap.release()
     if not ok:
-        return QImage()
+        return QImage(), probe
 
     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     h, w, _ = frame_rgb.shape
-    img = QImage(frame_rgb.data, w, h, QImage.Format_RGB888)
-    return img.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    img = QImage(frame_rgb.data, w, h, w * 3, QImage.Format_RGB888).copy()  # own the pixels
+    return img, probe
+
+
+def generate_thumbs(path: str, sizes: list[int], probe: VideoProbe | None = None) \
+        -> tuple[dict[int, QImage], VideoProbe | None]:
+    """
+    Thumbnails of path at several sizes from a single decode (largest size first, smaller ones scaled from it).
+    :param probe: Cached video probe data, skips re-probing
+    :return: ({size: image} without failed sizes, probe data for videos)
+    """
+    suffix = Path(path).suffix.lower()
+    largest = max(sizes)
+
+    # ----- images & GIFs --------------------------------------------------
+    if suffix not in VIDEO_SUFFIXES:
+        base = _image_thumb(path, suffix, largest)
+    # ----- videos ---------------------------------------------------------
+    else:
+        base, probe = _video_frame(path, probe)
+
+    if base.isNull():
+        return {}, probe
+    return {s: _fit(base, s) for s in sizes}, probe
+
+
+def _generate_thumb(path: str, size: int) -> QImage:
+    return generate_thumbs(path, [size])[0].get(size, QImage())
+
+
+def image_dhash(img: QImage) -> int:
+    """
+    Perceptual hash of an already decoded image (thumbnail-sized is plenty).
+    """
+    gray = img.convertToFormat(QImage.Format_Grayscale8)
+    w, h, stride = gray.width(), gray.height(), gray.bytesPerLine()
+    pixels = np.frombuffer(gray.constBits(), dtype=np.uint8, count=stride * h)
+    return dhash(pixels.reshape(h, stride)[:, :w])
+
+
+def path_dhash(path: str, size: int) -> int | None:
+    """
+    Decode path like a thumbnail and hash it, None if it cannot be read.
+    """
+    img = _generate_thumb(path, size)
+    return None if img.isNull() else image_dhash(img)
+
+
+def _from_disk(disk, path: str, size: int) -> QImage | None:
+    entry = disk.entry(path, size)
+    if entry is None:
+        return None
+    img = disk.load(entry)
+    if img is not None:
+        return img
+    for level in (lvl for lvl in THUMB_LEVELS if lvl > size):
+        larger = disk.entry(path, level)
+        big = disk.load(larger) if larger else None
+        if big is not None:
+            img = _fit(big, size)
+            disk.store(entry, img)
+            return img
+    return None
+
+
+def render_thumb(path: str, size: int, disk=None, probe: VideoProbe | None = None) \
+        -> tuple[QImage | None, VideoProbe | None, bool]:
+    """
+    Thumbnail of path at size: from the DiskThumbCache when stored at this or a larger level, else decoded
+    and written back at size and every smaller level.
+    :param probe: Cached video probe data, skips re-probing
+    :return: (image or None, probe data if the source was probed, True if the source was decoded)
+    """
+    img = _from_disk(disk, path, size) if disk else None
+    if img is not None:
+        return img, None, False
+    # one decode serves the smaller levels too, so shrinking the preset never re-decodes
+    sizes = [lvl for lvl in THUMB_LEVELS if lvl < size] + [size]
+    thumbs, new_probe = generate_thumbs(path, sizes, probe)
+    if disk:
+        for level, thumb in thumbs.items():
+            if (entry := disk.entry(path, level)) is not None:
+                disk.store(entry, thumb)
+    return thumbs.get(size), new_probe if probe is None else None, True
 
 
 class ThumbWorker(QRunnable):
     """
-    Runs off-thread: builds QImage, then posts a Pixmap-ready callback
-    back to the GUI thread.
+    Runs off-thread: renders path at size (render_thumb) and posts a ThumbResult to sink,
+    a thread-safe queue the GUI thread drains (ThumbDelivery).
+    With hash_new set, freshly decoded thumbnails are also perceptually hashed.
+    With a DiskThumbCache, a stored thumbnail for the file's current mtime / size
+    is used instead of decoding, else one stored at a larger level is scaled down.
+    Fresh decodes are written back at the requested and every smaller level.
+    Videos take cached probe data (probe) when known, a fresh probe is returned in the result.
+    """
+    def __init__(self, path: str, size: int, sink, disk=None, probe=None, hash_new: bool = True):
+        super().__init__()
+        self.path, self.size, self.sink = path, size, sink
+        self.disk = disk
+        self.probe = probe
+        self.hash_new = hash_new
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            img, new_probe, decoded = render_thumb(self.path, self.size, self.disk, self.probe)
+            # cached thumbnails were hashed when first generated
+            phash = image_dhash(img) if decoded and self.hash_new and img is not None else None
+            result = ThumbResult(self.path, self.size, img, phash, new_probe)
+        except Exception:
+            logger.exception(f"Thumbnail failed for {self.path}")
+            result = ThumbResult(self.path, self.size, None, None, None)
+        # always posted: the scheduler only frees the job's slot once its result is delivered
+        self.sink.post(result)
+
+
+class ThumbPrefetchWorker(QRunnable):
+    """
+    Reads the disk-cached thumbnails of a folder into the page cache in one sequential pass,
+    so the ThumbWorkers that follow hit memory instead of seeking for every file.
     """
-    def __init__(self, path: str, size: int, cb):
+    def __init__(self, disk, paths: list[str], size: int):
         super().__init__()
-        self.path, self.size, self.cb = path, size, cb
+        self.disk, self.paths, self.size = disk, paths, size
         self.setAutoDelete(True)
 
     def run(self):
-        img = _generate_thumb(self.path, self.size)
-        if img.isNull():
-            return
-
-        # schedule on the GUI thread (via QApplication's thread)
-        QTimer.singleShot(
-            0,
-            QApplication.instance(),  # receiver to main thread
-            lambda p=self.path, im=img:  # lambda runs in GUI thread
-            self.cb(p, QPixmap.fromImage(im))
-        )
+        self.disk.prefetch(self.paths, self.size)